@@ -2,13 +2,15 @@ import uuid
 from datetime import datetime
 
 from enum import Enum
-from typing import TypeVar, Generic, Optional
+from typing import Annotated, TypeVar, Generic, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic.generics import GenericModel
 
 from decimal import Decimal
 
+from app.core.config import settings
+
 T = TypeVar("T")
 
 class ResponseModel(GenericModel, Generic[T]):
@@ -23,27 +25,89 @@ class AddressCreationStatus(str, Enum):
 
 class TransactionStatus(str, Enum):
     PENDING = "pending"
+    RETRYING = "retrying"
     STARTED = "started"
     CONFIRMED = "confirmed"
     FAILED = "failed"
 
 # address creation endpoints
 class CreateAddressJobRequest(BaseModel):
-    quantity: int
+    quantity: int = Field(
+        ...,
+        description="Quantidade de endereços a serem gerados",
+        ge=1,
+        le=1_000_000
+    )
+
+class AllocateAddressesRequest(BaseModel):
+    quantity: int = Field(
+        default=1,
+        ge=1,
+        le=settings.ADDRESS_POOL_MAX_ALLOCATION,
+        description="Quantidade de endereços a serem entregues imediatamente"
+    )
 
 class CreateAddressResponse(BaseModel):
     job_id: uuid.UUID
     quantity: int
     status: AddressCreationStatus
 
+class AddressJobProgressResponse(BaseModel):
+    id: uuid.UUID
+    status: AddressCreationStatus
+    quantity: int
+    generated_count: int = Field(..., description="Endereços já gerados e salvos")
+    progress: float = Field(..., description="Fração dos endereços já gerados, de 0 a 1")
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    addresses_per_second: Optional[float] = Field(
+        default=None,
+        description="Endereços gerados por segundo desde o início do job"
+    )
+    estimated_seconds_remaining: Optional[float] = Field(
+        default=None,
+        description="Tempo estimado até a conclusão, na vazão atual"
+    )
+    attempts: int = Field(..., description="Execuções do job que falharam")
+    last_error: Optional[str] = None
+    next_attempt_at: Optional[datetime] = Field(
+        default=None,
+        description="Quando o job é executado de novo após uma falha"
+    )
+
 class AddressResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: uuid.UUID
     address: str
     created_at: datetime
 
 class AddressesResponse(BaseModel):
     data: list[AddressResponse]
-    count: int
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor da próxima página, ausente na última página"
+    )
+    count: Optional[int] = Field(
+        default=None,
+        description="Total aproximado de endereços entregues, quando solicitado"
+    )
+
+class AddressBalances(BaseModel):
+    address: str
+    balances: Optional[dict[str, Decimal]] = Field(
+        default=None,
+        description="Saldo por ativo (ETH e tokens), ausente se o node não respondeu para o endereço"
+    )
+
+class AddressBalancesResponse(BaseModel):
+    block_number: int = Field(..., description="Bloco em que os saldos foram lidos")
+    data: list[AddressBalances]
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor da próxima página, ausente na última página"
+    )
 
 # transaction related endpoints
 class CreateTransactionRequest(BaseModel):
@@ -69,7 +133,10 @@ class CreateTransactionRequest(BaseModel):
     )
 
 class TransactionHistoryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     transaction_hash: str
+    log_index: Optional[int] = None
     from_address: str
     to_address: str
     asset: str
@@ -79,6 +146,24 @@ class TransactionHistoryResponse(BaseModel):
     block_number: int
     created_at: datetime
 
+class TransactionHistoryFilter(BaseModel):
+    asset: Optional[str] = Field(
+        default=None,
+        description="Filtra pelo ativo transferido (ex: ETH, USDC)",
+        max_length=20
+    )
+    from_block: Optional[int] = Field(default=None, ge=0, description="Bloco inicial (inclusivo)")
+    to_block: Optional[int] = Field(default=None, ge=0, description="Bloco final (inclusivo)")
+    since: Optional[datetime] = Field(default=None, description="Registrada a partir de (inclusivo)")
+    until: Optional[datetime] = Field(default=None, description="Registrada antes de (exclusivo)")
+
+class TransactionHistoryPageResponse(BaseModel):
+    data: list[TransactionHistoryResponse]
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor da próxima página, ausente na última página"
+    )
+
 class TransactionResponse(BaseModel):
     transaction_hash: Optional[str]
     from_address: str
@@ -93,4 +178,23 @@ class ValidateTransactionRequest(BaseModel):
         ...,
         description="Hash da transação a ser validada",
         max_length=100
-    )
\ No newline at end of file
+    )
+
+class ValidateTransactionBatchRequest(BaseModel):
+    transaction_hashes: list[Annotated[str, Field(max_length=100)]] = Field(
+        ...,
+        description="Hashes das transações a serem validadas",
+        min_length=1,
+        max_length=settings.MAX_VALIDATION_BATCH_SIZE
+    )
+
+class TransactionValidationStatus(str, Enum):
+    CREATED = "created"
+    ALREADY_EXISTS = "already_exists"
+    INVALID = "invalid"
+
+class TransactionValidationResult(BaseModel):
+    transaction_hash: str
+    status: TransactionValidationStatus
+    detail: Optional[str] = None
+    data: list[TransactionHistoryResponse] = []
\ No newline at end of file
@@ -1,27 +1,63 @@
+import uuid
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 
 
-from app.models import AddressCreationJob
+from app.core.config import settings
+from app.models import AddressCreationJob, BalanceLedger
 from app.api.models.models import *
-from app.api.deps import SessionDep
-from app.service import address_service as service
+from app.api.deps import AsyncSessionDep
+from app.service import async_address_service as service
 
 router = APIRouter(prefix="/address", tags=["address"])
 
 @router.post("", response_model=ResponseModel[AddressCreationJob], status_code=status.HTTP_201_CREATED)
-def create_addresses(session: SessionDep, create_address_request: CreateAddressJobRequest) -> Any:
+async def create_addresses(session: AsyncSessionDep, create_address_request: CreateAddressJobRequest) -> Any:
     try:
-        job = service.create_address_job(session=session, job_data=create_address_request)
+        job = await service.create_address_job(session=session, job_data=create_address_request)
         return ResponseModel(status="success", data=job, message="Job created successfully")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Job creation failed")
 
-@router.get("", response_model=ResponseModel[list[AddressResponse]], status_code=status.HTTP_200_OK)
-def get_addresses(session: SessionDep) -> Any:
+@router.post("/allocate", response_model=ResponseModel[list[AddressResponse]], status_code=status.HTTP_201_CREATED)
+async def allocate_addresses(session: AsyncSessionDep, allocate_request: AllocateAddressesRequest) -> Any:
+    addresses = await service.allocate_addresses(session=session, quantity=allocate_request.quantity)
+    if addresses is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Address pool is running low, try again shortly or create an address job")
+    return ResponseModel(data=addresses, status="success", message="Addresses allocated successfully")
+
+@router.get("/balances", response_model=ResponseModel[AddressBalancesResponse], status_code=status.HTTP_200_OK)
+async def get_address_balances(session: AsyncSessionDep, cursor: Optional[str] = None,
+                               limit: int = Query(default=100, ge=1, le=settings.MAX_PAGE_SIZE)) -> Any:
+    try:
+        balances = await service.get_address_balances(session=session, cursor=cursor, limit=limit)
+        return ResponseModel(data=balances, status="success", message="Balances retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to retrieve balances")
+
+@router.get("/ledger", response_model=ResponseModel[list[BalanceLedger]], status_code=status.HTTP_200_OK)
+async def get_balance_ledger(session: AsyncSessionDep, address: str = Query(..., max_length=42)) -> Any:
+    try:
+        ledger = await service.get_balance_ledger(session=session, address=address)
+        return ResponseModel(data=ledger, status="success", message="Ledger retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to retrieve ledger")
+
+@router.get("/jobs/{job_id}", response_model=ResponseModel[AddressJobProgressResponse], status_code=status.HTTP_200_OK)
+async def get_address_job(session: AsyncSessionDep, job_id: uuid.UUID) -> Any:
+    job = await service.get_address_job_progress(session=session, job_id=job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return ResponseModel(data=job, status="success", message="Job retrieved successfully")
+
+@router.get("", response_model=ResponseModel[AddressesResponse], status_code=status.HTTP_200_OK)
+async def get_addresses(session: AsyncSessionDep, cursor: Optional[str] = None,
+                        limit: int = Query(default=100, ge=1, le=settings.MAX_PAGE_SIZE),
+                        include_count: bool = False) -> Any:
     try:
-        addresses = service.get_addresses(session=session)
+        addresses = await service.get_addresses(session=session, cursor=cursor, limit=limit, include_count=include_count)
         return ResponseModel(data=addresses, status="success", message="Addresses retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to retrieve addresses")
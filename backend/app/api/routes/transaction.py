@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated
 
-from app.api.deps import SessionDep
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.api.deps import AsyncSessionDep, SessionDep
+from app.core.config import settings
+from app.service import async_transaction_service as async_service
 from app.service import transaction_service as service
 from app.api.models.models import *
 
@@ -14,19 +18,29 @@ def create_transaction(session: SessionDep, transaction_request: CreateTransacti
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-@router.get("/history", response_model=ResponseModel[list[TransactionHistoryResponse]], status_code=status.HTTP_200_OK)
-def get_transactions_history_by_address(session: SessionDep, address: str):
+@router.get("/history", response_model=ResponseModel[TransactionHistoryPageResponse], status_code=status.HTTP_200_OK)
+async def get_transactions_history_by_address(session: AsyncSessionDep, address: str, filters: Annotated[TransactionHistoryFilter, Depends()],
+                                              cursor: Optional[str] = None,
+                                              limit: int = Query(default=100, ge=1, le=settings.MAX_PAGE_SIZE)):
     try:
-        transactions = service.get_transactions_history_by_address(session=session, address=address)
+        transactions = await async_service.get_transactions_history_by_address(session=session, address=address, cursor=cursor,
+                                                                               limit=limit, filters=filters)
         return ResponseModel(data=transactions, status="success", message="Transaction history retrieved successfully")
     except:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Address history not found.")
 
 @router.post("/validate", status_code=status.HTTP_200_OK)
-def validate_transaction(session: SessionDep, transaction_hash: ValidateTransactionRequest):
+async def validate_transaction(session: AsyncSessionDep, transaction_hash: ValidateTransactionRequest):
     try:
-        transactions = service.validate_transaction_hash(session=session, transaction_hash=transaction_hash.transaction_hash)
+        transactions = await async_service.validate_transaction_hash(session=session, transaction_hash=transaction_hash.transaction_hash)
         return ResponseModel(data=transactions, status="success", message="Transaction validated and history retrieved successfully")
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Couldn't validate the transaction.")
 
+@router.post("/validate/batch", response_model=ResponseModel[list[TransactionValidationResult]], status_code=status.HTTP_200_OK)
+async def validate_transactions(session: AsyncSessionDep, request: ValidateTransactionBatchRequest):
+    try:
+        results = await async_service.validate_transaction_hashes(session=session, transaction_hashes=request.transaction_hashes)
+        return ResponseModel(data=results, status="success", message="Transactions validated")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -0,0 +1,122 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import col, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import crud
+from app.api.models.models import CreateAddressJobRequest, TransactionHistoryFilter
+from app.integration.token_transfers import TokenTransfer
+from app.models import AddressCreationJob, Address, BalanceLedger, TransactionHistory
+
+from web3.types import TxData, TxReceipt
+
+from decimal import Decimal
+
+# async counterparts of app.crud for the request path
+
+async def create_address_job(*, session: AsyncSession, job_data: CreateAddressJobRequest) -> AddressCreationJob:
+    job = AddressCreationJob(quantity = job_data.quantity)
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+async def get_address_job(*, session: AsyncSession, job_id: uuid.UUID) -> AddressCreationJob | None:
+    return await session.get(AddressCreationJob, job_id)
+
+async def get_addresses(*, session: AsyncSession, after: tuple[datetime, uuid.UUID] | None = None, limit: int = 100) -> list[Address]:
+    statement = crud.addresses_page_statement(after=after, limit=limit)
+    addresses = (await session.exec(statement)).all()
+    return addresses
+
+async def assign_pool_addresses(*, session: AsyncSession, quantity: int) -> list[Address]:
+    statement = crud.assign_pool_addresses_statement(quantity=quantity)
+    addresses = (await session.exec(statement)).scalars().all()
+    return sorted(addresses, key=lambda address: address.index)
+
+async def notify(*, session: AsyncSession, channel: str) -> None:
+    await session.exec(text("SELECT pg_notify(:channel, '')").bindparams(channel=channel))
+
+async def get_balance_ledger(*, session: AsyncSession, address: str) -> list[BalanceLedger]:
+    statement = select(BalanceLedger).where(BalanceLedger.address == address).order_by(BalanceLedger.asset)
+    return (await session.exec(statement)).all()
+
+async def count_addresses(*, session: AsyncSession) -> int:
+    """Addresses handed out: the estimate of the table less the pool, which is small enough to count."""
+    pooled = (await session.exec(select(func.count()).select_from(Address).where(Address.assigned_at.is_(None)))).one()
+    estimate = (await session.exec(crud.approximate_count_statement(Address.__tablename__))).scalar_one()
+    if estimate >= 0:
+        return max(estimate - pooled, 0)
+    return (await session.exec(select(func.count()).select_from(Address))).one() - pooled
+
+async def check_address_exists(*, session: AsyncSession, address: str) -> bool:
+    statement = select(Address.id).where(Address.address == address)
+    existing_address = (await session.exec(statement)).first()
+    return existing_address is not None
+
+async def get_transaction_history_by_address(*, session: AsyncSession, address: str, after: tuple[datetime, uuid.UUID] | None = None,
+                                             limit: int = 100, filters: TransactionHistoryFilter | None = None) -> list[TransactionHistory]:
+    statement = crud.transaction_history_page_statement(address=address, after=after, limit=limit, filters=filters)
+    history = (await session.exec(statement)).all()
+    return history
+
+async def check_transaction_history_exists(*, session: AsyncSession, transaction_hash: str) -> bool:
+    statement = select(TransactionHistory.id).where(TransactionHistory.transaction_hash == transaction_hash)
+    existing_transaction = (await session.exec(statement)).first()
+    return existing_transaction is not None
+
+async def get_existing_addresses(*, session: AsyncSession, addresses: list[str], since: datetime | None = None) -> set[str]:
+    statement = select(Address.address).where(col(Address.address).in_(addresses))
+    if since is not None:
+        statement = statement.where(Address.created_at >= since)
+    return set((await session.exec(statement)).all())
+
+async def get_existing_transaction_hashes(*, session: AsyncSession, transaction_hashes: list[str]) -> set[str]:
+    statement = select(TransactionHistory.transaction_hash).where(col(TransactionHistory.transaction_hash).in_(transaction_hashes))
+    return set((await session.exec(statement)).all())
+
+async def bulk_create_transaction_history(*, session: AsyncSession, transaction_history: list[TransactionHistory]) -> list[TransactionHistory]:
+    """
+    Inserts the rows in chunks, in one database transaction, skipping transfers
+    stored meanwhile by another request, and returns the rows actually inserted.
+    """
+    if not transaction_history:
+        return []
+    inserted = []
+    for rows in crud.history_insert_chunks(transaction_history):
+        statement = (pg_insert(TransactionHistory).values(rows)
+                     .on_conflict_do_nothing(index_elements=[TransactionHistory.transaction_hash, TransactionHistory.log_index])
+                     .returning(TransactionHistory))
+        inserted += (await session.exec(select(TransactionHistory).from_statement(statement))).scalars().all()
+    await session.commit()
+    return inserted
+
+async def create_transaction_history_from_eth_tx(*, session: AsyncSession, transactions_hash: str, transaction_data: TxData, transaction_receipt: TxReceipt) -> TransactionHistory:
+    transaction_history = crud.build_transaction_history_from_eth_tx(transactions_hash=transactions_hash, transaction_data=transaction_data,
+                                                                     transaction_receipt=transaction_receipt)
+    session.add(transaction_history)
+    await session.commit()
+    await session.refresh(transaction_history)
+    return transaction_history
+
+async def create_transaction_history_from_token_transfers(*, session: AsyncSession, transactions_hash: str, transaction_data: TxReceipt,
+                                                          transfers: list[TokenTransfer]) -> list[TransactionHistory]:
+    transaction_history = [crud.build_transaction_history_from_contract_tx(transactions_hash=transactions_hash, transaction_data=transaction_data,
+                                                                           address=transfer.to_address, amount=transfer.amount,
+                                                                           asset=transfer.asset, log_index=transfer.log_index)
+                           for transfer in transfers]
+    session.add_all(transaction_history)
+    await session.commit()
+    return transaction_history
+
+async def create_transaction_history_from_contract_tx(*, session: AsyncSession, transactions_hash: str, transaction_data: TxReceipt, address: str, amount: Decimal, asset: str,
+                                                      log_index: int | None = None) -> TransactionHistory:
+    transaction_history = crud.build_transaction_history_from_contract_tx(transactions_hash=transactions_hash, transaction_data=transaction_data,
+                                                                          address=address, amount=amount, asset=asset, log_index=log_index)
+    session.add(transaction_history)
+    await session.commit()
+    await session.refresh(transaction_history)
+    return transaction_history
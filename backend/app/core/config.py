@@ -1,11 +1,15 @@
+import os
 import secrets
 import warnings
+from functools import cached_property
+from types import MappingProxyType
 from typing import Annotated, Any, Literal
 
 from pydantic import (
     AnyUrl,
     BeforeValidator,
     EmailStr,
+    Field,
     HttpUrl,
     PostgresDsn,
     computed_field,
@@ -15,9 +19,11 @@ from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing_extensions import Self
 
-from web3 import Web3
+from aiohttp import ClientTimeout
+from web3 import AsyncWeb3, Web3
 from app.core.abis import ERC20_ABI
 
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         # Use top level .env file (one level above ./backend/)
@@ -34,6 +40,9 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # connection pool of the async engine serving the API
+    ASYNC_DB_POOL_SIZE: int = 20
+    ASYNC_DB_MAX_OVERFLOW: int = 20
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -51,24 +60,54 @@ class Settings(BaseSettings):
     USER_MNEMONIC: str
     MAIN_USER_MNEMONIC: str
 
+    # max page size of the paginated listings
+    MAX_PAGE_SIZE: int = 1000
+    # max hashes per POST /transactions/validate/batch
+    MAX_VALIDATION_BATCH_SIZE: int = 1000
+
+    # in-process membership index of the Address table, see app.service.address_index
+    ADDRESS_INDEX_REFRESH_SECONDS: float = 5.0
+    # above this many addresses the index is a Bloom filter confirmed against the database
+    ADDRESS_INDEX_BLOOM_THRESHOLD: int = 5_000_000
+    ADDRESS_INDEX_BLOOM_BITS_PER_ENTRY: int = 16
+
+    # address generation pipeline
+    ADDRESS_GENERATION_WORKERS: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    ADDRESS_GENERATION_CHUNK_SIZE: int = 5_000
+
     # create infura endpoint
     INFURA_ENDPOINT: str
     INFURA_KEY: str
 
-    @computed_field  # type: ignore[prop-decorator]
-    @property
+    WEB3_HTTP_TIMEOUT: float = 10.0
+    # max calls per JSON-RPC batch request
+    WEB3_BATCH_SIZE: int = 100
+    # entries per cache of final transactions, receipts and contract code
+    CHAIN_CACHE_SIZE: int = 10_000
+    # address balances cached per block, see web3_integration.balance_cache
+    BALANCE_CACHE_SIZE: int = 50_000
+
+    @cached_property
     def WEB3_PROVIDER(self) -> Web3:
+        # one provider per process; web3 keeps a keep-alive session per calling
+        # thread, so each worker thread reuses its own connection
         infura_url = f"{self.INFURA_ENDPOINT}/{self.INFURA_KEY}"
-        return Web3(Web3.HTTPProvider(infura_url))
+        return Web3(Web3.HTTPProvider(infura_url, request_kwargs={"timeout": self.WEB3_HTTP_TIMEOUT}))
+
+    @cached_property
+    def ASYNC_WEB3_PROVIDER(self) -> AsyncWeb3:
+        # aiohttp sessions are pooled and kept alive per event loop by web3
+        infura_url = f"{self.INFURA_ENDPOINT}/{self.INFURA_KEY}"
+        timeout = ClientTimeout(total=self.WEB3_HTTP_TIMEOUT)
+        return AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(infura_url, request_kwargs={"timeout": timeout}))
 
     # contract addresses
     USDC_ADDRESS: str
     PYUSD_ADDRESS: str
     EURC_ADDRESS: str
 
-    @computed_field  # type: ignore[prop-decorator]
-    @property
-    def token_by_symbol(self) -> dict[str, dict[str, Any]]:
+    @cached_property
+    def token_by_symbol(self) -> MappingProxyType[str, MappingProxyType[str, Any]]:
         usdc_token_address = Web3.to_checksum_address(self.USDC_ADDRESS)
         usdc_token_contract = self.WEB3_PROVIDER.eth.contract(
             address=usdc_token_address,
@@ -85,21 +124,86 @@ class Settings(BaseSettings):
             abi=ERC20_ABI,
         )
 
-        return {
-            "USDC": {"symbol": "USDC", "address": usdc_token_address, "contract": usdc_token_contract, "decimals": 6},
-            "PYUSD": {"symbol": "PYUSD", "address": pyusd_token_address, "contract": pyusd_token_contract, "decimals": 6},
-            "EURC": {"symbol": "EURC", "address": eurc_token_address, "contract": eurc_token_contract, "decimals": 6},
-        }
+        return MappingProxyType({
+            "USDC": MappingProxyType({"symbol": "USDC", "address": usdc_token_address, "contract": usdc_token_contract, "decimals": 6}),
+            "PYUSD": MappingProxyType({"symbol": "PYUSD", "address": pyusd_token_address, "contract": pyusd_token_contract, "decimals": 6}),
+            "EURC": MappingProxyType({"symbol": "EURC", "address": eurc_token_address, "contract": eurc_token_contract, "decimals": 6}),
+        })
 
-    @computed_field  # type: ignore[prop-decorator]
-    @property
-    def token_by_contract_address(self) -> dict[str, dict[str, Any]]:
-        return {
-            self.USDC_ADDRESS: self.token_by_symbol.get("USDC"),
-            self.PYUSD_ADDRESS: self.token_by_symbol.get("PYUSD"),
-            self.EURC_ADDRESS: self.token_by_symbol.get("EURC"),
-        }
+    @cached_property
+    def token_by_contract_address(self) -> MappingProxyType[str, MappingProxyType[str, Any]]:
+        return MappingProxyType({token["address"]: token for token in self.token_by_symbol.values()})
 
     CHAIN_ID: str
 
+    # blocks on top of the inclusion block before a transaction is final
+    CONFIRMATIONS_REQUIRED: int = 6
+    # blocks a STARTED transaction has to stay unknown to the node, neither mined
+    # nor pending, before it is considered dropped and FAILED
+    TRANSACTION_DROPPED_AFTER_BLOCKS: int = 25
+
+    # fee policy, used by every send path through app.integration.fee_oracle
+    USE_EIP1559: bool = True
+    GAS_LIMIT_BUFFER: float = 1.2
+    ERC20_TRANSFER_GAS_FALLBACK: int = 65000  # enough for most ERC20 transfers
+    BASE_FEE_MULTIPLIER: int = 2  # headroom for base fee increases before inclusion
+    FEE_HISTORY_BLOCKS: int = 10
+    FEE_PRIORITY_PERCENTILE: float = 50
+    FEE_ORACLE_POLL_SECONDS: float = 2.0
+
+    # background jobs, run by the worker (python -m app.worker), see app.scheduler.schedulers
+    # also run them inside the API process, for single-container setups
+    API_RUN_SCHEDULER: bool = False
+    WORKER_THREADS: int = 10
+    # the queue jobs are woken by NOTIFY on inserts and by new blocks, these
+    # intervals are only the polling fallback, see app.scheduler.wakeups
+    ADDRESS_JOB_INTERVAL_SECONDS: int = 60
+    # address jobs a worker runs at the same time
+    ADDRESS_JOB_CONCURRENCY: int = 1
+    # failed runs after which an address job is marked FAILED; the runs in
+    # between wait an exponential backoff
+    ADDRESS_JOB_MAX_ATTEMPTS: int = 3
+    ADDRESS_JOB_RETRY_BASE_SECONDS: int = 30
+    ADDRESS_JOB_RETRY_MAX_SECONDS: int = 600
+    # warm pool of unassigned addresses, see app.service.address_pool; refilled up
+    # to the high watermark when it falls under the low one
+    ADDRESS_POOL_ENABLED: bool = True
+    ADDRESS_POOL_LOW_WATERMARK: int = 1_000
+    ADDRESS_POOL_HIGH_WATERMARK: int = 5_000
+    ADDRESS_POOL_INTERVAL_SECONDS: int = 60
+    # addresses a single allocation can take from the pool
+    ADDRESS_POOL_MAX_ALLOCATION: int = 100
+    TRANSACTION_JOB_INTERVAL_SECONDS: int = 30
+    FINALIZATION_JOB_INTERVAL_SECONDS: int = 60
+
+    # leases on the rows of the work queues, see app.service.lease_service
+    # worker name recorded in claimed_by, the process id is appended; defaults to the host name
+    WORKER_ID: str | None = None
+    LEASE_SECONDS: int = 60
+    # transactions a worker claims per run of each transaction job
+    CLAIM_BATCH_SIZE: int = 500
+
+    # broadcast of PENDING transactions, see app.service.broadcast_service
+    BROADCAST_WORKERS: int = 8
+    BROADCAST_MAX_ATTEMPTS: int = 10
+    BROADCAST_RETRY_BASE_SECONDS: int = 30
+    BROADCAST_RETRY_MAX_SECONDS: int = 3_600
+
+    # check of the balance ledger against the history, see app.service.ledger_service
+    LEDGER_CHECK_INTERVAL_SECONDS: int = 3_600
+
+    # deposit indexer, see app.service.deposit_indexer
+    INDEXER_ENABLED: bool = True
+    INDEXER_INTERVAL_SECONDS: int = 15
+    # blocks behind the head the indexer stays, 0 on a local dev chain
+    INDEXER_CONFIRMATIONS: int = 6
+    # first block scanned when there is no checkpoint yet, defaults to the current safe head
+    INDEXER_START_BLOCK: int | None = None
+    INDEXER_INITIAL_RANGE: int = 100
+    INDEXER_MAX_RANGE: int = 2_000
+    # logs per eth_getLogs call the range size is adjusted towards
+    INDEXER_TARGET_LOGS: int = 2_000
+    # scan block bodies for plain ETH deposits
+    INDEXER_ETH_DEPOSITS: bool = True
+
 settings = Settings()  # type: ignore
@@ -1,3 +1,7 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, create_engine, select
 
 from app import crud
@@ -6,6 +10,11 @@ from app.utils import get_main_address
 from app.models import Address
 
 engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+)
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -13,6 +22,85 @@ engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
 # for more details: https://github.com/fastapi/full-stack-fastapi-template/issues/28
 
 
+# NOTIFY channels of the queue tables, the workers wake up on them (see
+# app.scheduler.wakeups). One notification per inserting statement, Postgres
+# also folds identical ones within a transaction.
+ADDRESS_JOBS_CHANNEL = "address_jobs"
+TRANSACTIONS_CHANNEL = "transactions"
+ADDRESS_POOL_CHANNEL = "address_pool"
+
+WAKEUP_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION notify_wakeup() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify(TG_ARGV[0], '');
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER addresscreationjob_wakeup AFTER INSERT ON addresscreationjob
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_wakeup('{ADDRESS_JOBS_CHANNEL}')
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER address_pool_wakeup AFTER UPDATE OF assigned_at ON address
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_wakeup('{ADDRESS_POOL_CHANNEL}')
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER transaction_wakeup AFTER INSERT ON "transaction"
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_wakeup('{TRANSACTIONS_CHANNEL}')
+    """,
+]
+
+# Applies the TransactionHistory rows of each inserting statement to the
+# BalanceLedger of the addresses they move funds of, in the transaction that
+# inserts them. The gas of a transaction is charged once to its sender: by the
+# statement that records its first row, whatever the log indexes of its rows
+# (two transactions recording rows of one hash at the same time can both charge
+# it, the consistency check in app.service.ledger_service repairs that).
+# crud.LEDGER_FROM_HISTORY computes the same from scratch, keep them in step.
+LEDGER_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION transactionhistory_to_ledger() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO balanceledger AS l (address, asset, received, sent, gas_spent, balance, block_number, updated_at)
+        SELECT address, asset, sum(received), sum(sent), sum(gas_spent), sum(received) - sum(sent) - sum(gas_spent),
+               max(block_number), now()
+        FROM (
+            SELECT n.to_address AS address, n.asset, n.amount AS received, 0 AS sent, 0 AS gas_spent, n.block_number
+            FROM inserted n JOIN address a ON a.address = n.to_address
+            UNION ALL
+            SELECT n.from_address, n.asset, 0, n.amount, 0, n.block_number
+            FROM inserted n JOIN address a ON a.address = n.from_address
+            UNION ALL
+            SELECT * FROM (
+                SELECT DISTINCT ON (n.transaction_hash, n.from_address) n.from_address, 'ETH', 0, 0,
+                       n.gas::numeric * n.gas_price * 0.000000000000000001, n.block_number
+                FROM inserted n JOIN address a ON a.address = n.from_address
+                WHERE NOT EXISTS (SELECT 1 FROM transactionhistory o WHERE o.transaction_hash = n.transaction_hash
+                                  AND o.from_address = n.from_address AND o.id NOT IN (SELECT id FROM inserted))
+            ) gas
+        ) moves
+        GROUP BY address, asset
+        ON CONFLICT (address, asset) DO UPDATE SET
+            received = l.received + EXCLUDED.received,
+            sent = l.sent + EXCLUDED.sent,
+            gas_spent = l.gas_spent + EXCLUDED.gas_spent,
+            balance = l.balance + EXCLUDED.balance,
+            block_number = GREATEST(l.block_number, EXCLUDED.block_number),
+            updated_at = now();
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER transactionhistory_ledger AFTER INSERT ON transactionhistory
+    REFERENCING NEW TABLE AS inserted
+    FOR EACH STATEMENT EXECUTE FUNCTION transactionhistory_to_ledger()
+    """,
+]
+
+
 def init_db(session: Session) -> None:
     # Tables should be created with Alembic migrations
     # But if you don't want to use migrations, create
@@ -21,12 +109,15 @@ def init_db(session: Session) -> None:
 
     # This works because the models are already imported and registered from app.models
     SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for statement in [*WAKEUP_TRIGGERS, *LEDGER_TRIGGERS]:
+            conn.execute(text(statement))
 
     main_address = get_main_address()
 
     address = crud.get_address(session=session, address=main_address)
     if not address:
-        address = Address(address=main_address, index=0)
+        address = Address(address=main_address, index=0, assigned_at=datetime.now(timezone.utc))
         session.add(address)
         session.commit()
 
@@ -1,16 +1,22 @@
 import uuid
-from typing import Any
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
 
-from sqlmodel import Session, select
+from sqlalchemy import or_, text, tuple_, union_all
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, col, select, update, func
 
 from app.models import *
 
 
-from app.models import AddressCreationJob, Address, TransactionHistory, Transaction
+from app.core.config import settings
+from app.models import AddressCreationJob, Address, AddressIndexCounter, AddressNonce, IndexerCheckpoint, TransactionHistory, Transaction
 from app.api.models.models import AddressCreationStatus
-from app.utils import get_random_eth_address
+from app.integration.token_transfers import TokenTransfer
+from app.utils import generate_eth_addresses
 
-from app.api.models.models import CreateAddressJobRequest
+from app.api.models.models import CreateAddressJobRequest, TransactionHistoryFilter
 
 from web3.types import TxData, TxReceipt
 from web3 import Web3
@@ -25,55 +31,243 @@ def create_address_job(*, session: Session, job_data: CreateAddressJobRequest) -
     return job
 
 def get_create_address_jobs(*, session: Session) -> AddressCreationJob:
-    print("getting inside get_create_address_jobs")
     statement = select(AddressCreationJob).where(AddressCreationJob.status == AddressCreationStatus.PENDING).order_by(AddressCreationJob.created_at)
     job = session.exec(statement).first()
     return job
 
-def create_addresses(*, session: Session, quantity: int):
-    addresses = []
-    for _ in range(quantity):
-        addresses.append(get_random_eth_address())
-    session.add_all(addresses)
+# Work queue rows are leased to one worker at a time. Candidates are picked
+# with FOR UPDATE SKIP LOCKED so concurrent claims never wait on or take the
+# same rows, and the lease written on them keeps other workers away once the
+# claim commits, until it expires or is released.
+
+LeasedModel = type[AddressCreationJob] | type[Transaction]
+
+def _claim(*, session: Session, model: LeasedModel, conditions: list, limit: int, worker_id: str) -> list:
+    candidates = (select(model.id)
+                  .where(*conditions, or_(model.lease_expires_at.is_(None), model.lease_expires_at < func.now()))
+                  .order_by(model.created_at)
+                  .limit(limit)
+                  .with_for_update(skip_locked=True))
+    statement = (update(model)
+                 .where(model.id.in_(candidates))
+                 .values(claimed_by=worker_id, lease_expires_at=func.now() + timedelta(seconds=settings.LEASE_SECONDS))
+                 .returning(model))
+    rows = session.exec(select(model).from_statement(statement)).scalars().all()
+    return sorted(rows, key=lambda row: row.created_at)
+
+def extend_leases(*, session: Session, model: LeasedModel, ids: list[uuid.UUID], worker_id: str) -> int:
+    statement = (update(model)
+                 .where(model.id.in_(ids), model.claimed_by == worker_id)
+                 .values(lease_expires_at=func.now() + timedelta(seconds=settings.LEASE_SECONDS)))
+    return session.exec(statement).rowcount
+
+def release_leases(*, session: Session, model: LeasedModel, ids: list[uuid.UUID], worker_id: str) -> int:
+    statement = (update(model)
+                 .where(model.id.in_(ids), model.claimed_by == worker_id)
+                 .values(claimed_by=None, lease_expires_at=None))
+    return session.exec(statement).rowcount
+
+def fail_address_job_run(*, session: Session, job: AddressCreationJob, error: Exception) -> None:
+    session.rollback()
+    job.attempts += 1
+    job.last_error = str(error)[:500]
+    if job.attempts >= settings.ADDRESS_JOB_MAX_ATTEMPTS:
+        job.status = AddressCreationStatus.FAILED
+        job.next_attempt_at = None
+    else:
+        delay = min(settings.ADDRESS_JOB_RETRY_MAX_SECONDS, settings.ADDRESS_JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+        job.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+    session.add(job)
+    session.commit()
+
+def claim_address_job(*, session: Session, worker_id: str) -> AddressCreationJob | None:
+    """Leases the oldest PENDING job, failed ones once their retry is due."""
+    conditions = [AddressCreationJob.status == AddressCreationStatus.PENDING,
+                  or_(AddressCreationJob.next_attempt_at.is_(None), AddressCreationJob.next_attempt_at <= func.now())]
+    jobs = _claim(session=session, model=AddressCreationJob, conditions=conditions, limit=1, worker_id=worker_id)
+    return jobs[0] if jobs else None
+
+USER_WALLET = "user"
+MAX_ADDRESS_INDEX = 2 ** 31 - 1  # last non-hardened BIP32 index
+
+def reserve_address_indexes(*, session: Session, quantity: int, mnemonic: str = USER_WALLET) -> range:
+    """
+    Reserves a contiguous range of indexes with quantity of them free. Indexes
+    already taken by an address, e.g. the random ones of wallets created before
+    the allocator, are skipped, and the range grows to make up for them.
+    """
+    session.exec(pg_insert(AddressIndexCounter).values(mnemonic=mnemonic, next_index=0).on_conflict_do_nothing())
+    start = end = None
+    missing = quantity
+    while missing:
+        # the UPDATE takes a row lock held until the commit, so concurrent
+        # reservations get disjoint ranges and each extension follows the last
+        statement = (update(AddressIndexCounter)
+                     .where(AddressIndexCounter.mnemonic == mnemonic)
+                     .values(next_index=AddressIndexCounter.next_index + missing)
+                     .returning(AddressIndexCounter.next_index))
+        end = session.exec(statement).scalar_one()
+        if end - 1 > MAX_ADDRESS_INDEX:
+            session.rollback()
+            raise ValueError(f"Wallet {mnemonic} has no free address indexes left.")
+        if start is None:
+            start = end - missing
+        missing = len(get_taken_address_indexes(session=session, indexes=range(end - missing, end)))
+    return range(start, end)
+
+def get_taken_address_indexes(*, session: Session, indexes: range) -> set[int]:
+    statement = select(Address.index).where(Address.index >= indexes.start, Address.index < indexes.stop)
+    return set(session.exec(statement).all())
+
+def get_free_address_indexes(*, session: Session, indexes: range) -> list[int]:
+    """The indexes of the range no address was derived from yet."""
+    taken = get_taken_address_indexes(session=session, indexes=indexes)
+    return [index for index in indexes if index not in taken]
 
-def get_addresses(*, session: Session) -> list[Address]:
-    statement = select(Address) #.offset(skip).limit(limit)
+def generate_job_addresses(*, session: Session, job: AddressCreationJob) -> None:
+    """
+    Generates the addresses of the job from where it stopped. Each chunk is
+    committed with the job's generated_count, so a run cut short anywhere is
+    resumed with the indexes of its range that have no address yet.
+    """
+    if job.first_index is None:
+        indexes = reserve_address_indexes(session=session, quantity=job.quantity)
+        job.first_index, job.end_index = indexes.start, indexes.stop
+        job.started_at = func.now()
+        session.add(job)
+        # the range stays with the job for its later runs; release the counter row right away
+        session.commit()
+
+    remaining = get_free_address_indexes(session=session, indexes=range(job.first_index, job.end_index))
+    for chunk in generate_eth_addresses(remaining):
+        bulk_insert_addresses(session=session, addresses=chunk)
+        job.generated_count += len(chunk)
+        session.add(job)
+        session.commit()
+
+def bulk_insert_addresses(*, session: Session, addresses: list[tuple[int, str]], assigned: bool = True) -> None:
+    """Inserts addresses handed out right away, or into the pool when not assigned."""
+    if not addresses:
+        return
+    assigned_at = datetime.now(timezone.utc) if assigned else None
+    # executemany on a Core insert is sent as multi-row INSERT statements (insertmanyvalues)
+    rows = [{"id": uuid.uuid4(), "address": address, "index": index, "assigned_at": assigned_at}
+            for index, address in addresses]
+    # the indexes are free; an address that exists all the same is skipped instead of failing the batch
+    session.connection().execute(pg_insert(Address).on_conflict_do_nothing(index_elements=["address"]), rows)
+
+def addresses_page_statement(*, after: tuple[datetime, uuid.UUID] | None, limit: int):
+    """
+    Page of the addresses handed out, pool addresses are not listed. Walked by
+    assignment time, so an address handed out during a walk is on a later page.
+    """
+    statement = (select(Address)
+                 .where(Address.assigned_at.is_not(None))
+                 .order_by(Address.assigned_at, Address.id)
+                 .limit(limit))
+    if after is not None:
+        statement = statement.where(tuple_(Address.assigned_at, Address.id) > tuple_(*after))
+    return statement
+
+def approximate_count_statement(table_name: str):
+    # planner estimate, kept up to date by autovacuum; -1 when the table was never analyzed
+    return text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table_name AS regclass)").bindparams(table_name=table_name)
+
+def get_addresses(*, session: Session, after: tuple[datetime, uuid.UUID] | None = None, limit: int = 100) -> list[Address]:
+    statement = addresses_page_statement(after=after, limit=limit)
     addresses = session.exec(statement).all()
     return addresses
 
+def count_addresses(*, session: Session) -> int:
+    return session.exec(select(func.count()).select_from(Address)).one()
+
+def count_pool_addresses(*, session: Session) -> int:
+    return session.exec(select(func.count()).select_from(Address).where(Address.assigned_at.is_(None))).one()
+
+def assign_pool_addresses_statement(*, quantity: int):
+    """Hands out quantity pool addresses, lowest index first; concurrent allocations skip each other's rows."""
+    pooled = (select(Address.id)
+              .where(Address.assigned_at.is_(None))
+              .order_by(Address.index)
+              .limit(quantity)
+              .with_for_update(skip_locked=True))
+    statement = (update(Address)
+                 .where(Address.id.in_(pooled))
+                 .values(assigned_at=func.now())
+                 .returning(Address))
+    return select(Address).from_statement(statement)
+
 def check_address_exists(*, session: Session, address: str) -> bool:
     statement = select(Address).where(Address.address == address)
     existing_address = session.exec(statement).first()
     return existing_address is not None
 
+def get_existing_addresses(*, session: Session, addresses: list[str], since: datetime | None = None) -> set[str]:
+    statement = select(Address.address).where(col(Address.address).in_(addresses))
+    if since is not None:
+        statement = statement.where(Address.created_at >= since)
+    return set(session.exec(statement).all())
+
+def get_addresses_created_since(*, session: Session, since: datetime | None) -> Iterator[str]:
+    statement = select(Address.address)
+    if since is not None:
+        statement = statement.where(Address.created_at >= since)
+    # streamed with a server-side cursor, the first load reads the whole table
+    yield from session.exec(statement.execution_options(stream_results=True, yield_per=10_000))
+
+def get_address_refresh_floor(*, session: Session) -> datetime:
+    """Start of the oldest transaction still open on the database, or now."""
+    statement = text("SELECT LEAST(now(), min(xact_start)) FROM pg_stat_activity "
+                     "WHERE datname = current_database() AND xact_start IS NOT NULL")
+    return session.exec(statement).scalar_one()
+
 def get_address(*, session: Session, address: str) -> Address:
     statement = select(Address).where(Address.address == address)
     existing_address = session.exec(statement).first()
     return existing_address
 
-def create_transaction_history_from_eth_tx(*, session: Session, transactions_hash: str, transaction_data: TxData, transaction_receipt: TxReceipt) -> TransactionHistory:
+def build_transaction_history_from_eth_tx(*, transactions_hash: str, transaction_data: TxData, transaction_receipt: TxReceipt) -> TransactionHistory:
     amount = Web3.from_wei(int(transaction_data['value']), 'ether')  # Convert wei to ether
-    transaction_history = TransactionHistory(transaction_hash=transactions_hash,from_address=transaction_data['from'],
-                                             to_address=transaction_data['to'], asset='ETH',
-                                             amount=amount, gas=transaction_receipt['gasUsed'],
-                                             gas_price=transaction_receipt['effectiveGasPrice'], block_number=transaction_data['blockNumber'])
+    return TransactionHistory(transaction_hash=transactions_hash,from_address=transaction_data['from'],
+                              to_address=transaction_data['to'], asset='ETH',
+                              amount=amount, gas=transaction_receipt['gasUsed'],
+                              gas_price=transaction_receipt['effectiveGasPrice'], block_number=transaction_data['blockNumber'])
 
+def create_transaction_history_from_eth_tx(*, session: Session, transactions_hash: str, transaction_data: TxData, transaction_receipt: TxReceipt) -> TransactionHistory:
+    transaction_history = build_transaction_history_from_eth_tx(transactions_hash=transactions_hash, transaction_data=transaction_data,
+                                                                transaction_receipt=transaction_receipt)
     session.add(transaction_history)
     session.commit()
     session.refresh(transaction_history)
     return transaction_history
 
-def create_transaction_history_from_contract_tx(*, session: Session, transactions_hash: str, transaction_data: TxReceipt, address: str, amount: Decimal, asset: str) -> TransactionHistory:
-    transaction_history = TransactionHistory(transaction_hash=transactions_hash,from_address=transaction_data['from'],
-                                             to_address=address, asset=asset,
-                                             amount=amount, gas=transaction_data['gasUsed'],
-                                             gas_price=transaction_data['effectiveGasPrice'], block_number=transaction_data['blockNumber'])
+def build_transaction_history_from_contract_tx(*, transactions_hash: str, transaction_data: TxReceipt, address: str, amount: Decimal, asset: str,
+                                               log_index: int | None = None) -> TransactionHistory:
+    return TransactionHistory(transaction_hash=transactions_hash,from_address=transaction_data['from'],
+                              to_address=address, asset=asset,
+                              amount=amount, gas=transaction_data['gasUsed'],
+                              gas_price=transaction_data['effectiveGasPrice'], block_number=transaction_data['blockNumber'],
+                              log_index=log_index)
 
+def create_transaction_history_from_contract_tx(*, session: Session, transactions_hash: str, transaction_data: TxReceipt, address: str, amount: Decimal, asset: str,
+                                                log_index: int | None = None) -> TransactionHistory:
+    transaction_history = build_transaction_history_from_contract_tx(transactions_hash=transactions_hash, transaction_data=transaction_data,
+                                                                     address=address, amount=amount, asset=asset, log_index=log_index)
     session.add(transaction_history)
     session.commit()
     session.refresh(transaction_history)
     return transaction_history
 
+def create_transaction_history_from_token_transfers(*, session: Session, transactions_hash: str, transaction_data: TxReceipt,
+                                                    transfers: list[TokenTransfer]) -> list[TransactionHistory]:
+    transaction_history = [build_transaction_history_from_contract_tx(transactions_hash=transactions_hash, transaction_data=transaction_data,
+                                                                      address=transfer.to_address, amount=transfer.amount,
+                                                                      asset=transfer.asset, log_index=transfer.log_index)
+                           for transfer in transfers]
+    session.add_all(transaction_history)
+    session.commit()
+    return transaction_history
+
 def create_transaction_history_from_tx(*, session: Session, tx: Transaction, tx_receipt: TxReceipt) -> TransactionHistory:
     transaction_history = TransactionHistory(transaction_hash=tx.transaction_hash, from_address=tx.from_address,
                                              to_address=tx.to_address, asset=tx.asset,
@@ -86,10 +280,43 @@ def create_transaction_history_from_tx(*, session: Session, tx: Transaction, tx_
     session.refresh(transaction_history)
     return transaction_history
 
-def get_transaction_history_by_address(*, session: Session, address: str) -> list[TransactionHistory]:
-    statement = (select(TransactionHistory)
-                 .where(TransactionHistory.from_address == address or TransactionHistory.to_address == address)
-                 .order_by(TransactionHistory.created_at))
+def transaction_history_page_statement(*, address: str, after: tuple[datetime, uuid.UUID] | None, limit: int,
+                                       filters: TransactionHistoryFilter | None = None):
+    conditions = []
+    if after is not None:
+        conditions.append(tuple_(TransactionHistory.created_at, TransactionHistory.id) > tuple_(*after))
+    if filters is not None:
+        if filters.asset is not None:
+            conditions.append(TransactionHistory.asset == filters.asset)
+        if filters.from_block is not None:
+            conditions.append(TransactionHistory.block_number >= filters.from_block)
+        if filters.to_block is not None:
+            conditions.append(TransactionHistory.block_number <= filters.to_block)
+        if filters.since is not None:
+            conditions.append(TransactionHistory.created_at >= filters.since)
+        if filters.until is not None:
+            conditions.append(TransactionHistory.created_at < filters.until)
+
+    def side(*side_conditions):
+        return (select(TransactionHistory.id, TransactionHistory.created_at)
+                .where(*side_conditions, *conditions)
+                .order_by(TransactionHistory.created_at, TransactionHistory.id)
+                .limit(limit))
+
+    # each side is an index range scan on (address, created_at, id); an OR across
+    # both columns can't use either index. Self transfers only come from the first side.
+    page = union_all(
+        side(TransactionHistory.from_address == address),
+        side(TransactionHistory.to_address == address, TransactionHistory.from_address != address),
+    ).subquery()
+    return (select(TransactionHistory)
+            .join(page, TransactionHistory.id == page.c.id)
+            .order_by(TransactionHistory.created_at, TransactionHistory.id)
+            .limit(limit))
+
+def get_transaction_history_by_address(*, session: Session, address: str, after: tuple[datetime, uuid.UUID] | None = None,
+                                       limit: int = 100, filters: TransactionHistoryFilter | None = None) -> list[TransactionHistory]:
+    statement = transaction_history_page_statement(address=address, after=after, limit=limit, filters=filters)
     history = session.exec(statement).all()
     return history
 
@@ -108,4 +335,138 @@ def get_transactions_by_status(*, session: Session, status: TransactionStatus) -
 def check_transaction_history_exists(*, session: Session, transaction_hash: str) -> bool:
     statement = select(TransactionHistory).where(TransactionHistory.transaction_hash == transaction_hash)
     existing_transaction = session.exec(statement).first()
-    return existing_transaction is not None
\ No newline at end of file
+    return existing_transaction is not None
+
+def claim_broadcastable_transactions(*, session: Session, worker_id: str, limit: int) -> list[Transaction]:
+    """Leases the due PENDING and RETRYING transactions, oldest first."""
+    conditions = [(Transaction.status == TransactionStatus.PENDING) |
+                  ((Transaction.status == TransactionStatus.RETRYING) & (Transaction.next_attempt_at <= func.now()))]
+    return _claim(session=session, model=Transaction, conditions=conditions, limit=limit, worker_id=worker_id)
+
+def get_inflight_funding(*, session: Session, funder: str) -> dict[str, Decimal]:
+    """ETH sent by funder that is not mined yet, per recipient."""
+    statement = (select(Transaction.to_address, func.sum(Transaction.amount))
+                 .where(Transaction.from_address == funder, Transaction.asset == "ETH",
+                        Transaction.status == TransactionStatus.STARTED, Transaction.block_number.is_(None))
+                 .group_by(Transaction.to_address))
+    return dict(session.exec(statement).all())
+
+def bulk_create_transactions(*, session: Session, transactions: list[Transaction]) -> None:
+    session.add_all(transactions)
+    session.commit()
+
+def claim_unmined_transactions(*, session: Session, worker_id: str, limit: int) -> list[Transaction]:
+    """Leases the STARTED transactions whose inclusion block is still unknown, oldest first."""
+    conditions = [Transaction.status == TransactionStatus.STARTED, Transaction.block_number.is_(None)]
+    return _claim(session=session, model=Transaction, conditions=conditions, limit=limit, worker_id=worker_id)
+
+def confirm_transactions(*, session: Session, max_block_number: int) -> int:
+    """
+    Confirms every STARTED transaction mined at or below max_block_number and
+    records its history, in a single statement regardless of how many are in flight.
+    Token transfers carry the index of their log, so a transfer the validation
+    endpoints or the deposit indexer already recorded is not recorded again.
+    """
+    confirmed = (update(Transaction)
+                 .where(Transaction.status == TransactionStatus.STARTED,
+                        Transaction.block_number <= max_block_number)
+                 .values(status=TransactionStatus.CONFIRMED)
+                 .returning(Transaction.transaction_hash, Transaction.from_address, Transaction.to_address,
+                            Transaction.asset, Transaction.amount, Transaction.gas_used,
+                            Transaction.effective_gas_price, Transaction.block_number, Transaction.log_index)
+                 .cte("confirmed"))
+    columns = ["id", "transaction_hash", "from_address", "to_address", "asset", "amount", "gas", "gas_price", "block_number",
+               "log_index"]
+    history = (pg_insert(TransactionHistory)
+               .from_select(columns, select(func.gen_random_uuid(), *confirmed.c))
+               .on_conflict_do_nothing(index_elements=["transaction_hash", "log_index"])
+               .returning(TransactionHistory.id))
+    # rows skipped by ON CONFLICT were already recorded, e.g. through /transactions/validate or the deposit indexer
+    return len(session.exec(history).all())
+
+
+def get_sent_transaction_hashes(*, session: Session, transaction_hashes: list[str]) -> set[str]:
+    statement = select(Transaction.transaction_hash).where(col(Transaction.transaction_hash).in_(transaction_hashes))
+    return set(session.exec(statement).all())
+
+# rows per multi-row INSERT of transaction history, well under the 65535 bind
+# parameters a Postgres statement takes
+HISTORY_INSERT_CHUNK_SIZE = 1_000
+
+def history_insert_chunks(transaction_history: list[TransactionHistory]) -> Iterator[list[dict[str, Any]]]:
+    # created_at is left to the server default
+    rows = [history.model_dump(exclude={"created_at"}) for history in transaction_history]
+    for start in range(0, len(rows), HISTORY_INSERT_CHUNK_SIZE):
+        yield rows[start:start + HISTORY_INSERT_CHUNK_SIZE]
+
+def bulk_create_transaction_history(*, session: Session, transaction_history: list[TransactionHistory]) -> int:
+    """Inserts the rows in chunks, skipping transfers already recorded, and returns how many were inserted."""
+    inserted = 0
+    for rows in history_insert_chunks(transaction_history):
+        statement = (pg_insert(TransactionHistory).values(rows)
+                     .on_conflict_do_nothing(index_elements=["transaction_hash", "log_index"])
+                     .returning(TransactionHistory.id))
+        inserted += len(session.exec(statement).all())
+    return inserted
+
+# the balance ledger computed from scratch, by the same rules as the trigger
+# that maintains it (app.core.db.LEDGER_TRIGGERS)
+LEDGER_FROM_HISTORY = """
+    SELECT address, asset, sum(received) AS received, sum(sent) AS sent, sum(gas_spent) AS gas_spent,
+           sum(received) - sum(sent) - sum(gas_spent) AS balance, max(block_number) AS block_number
+    FROM (
+        SELECT h.to_address AS address, h.asset, h.amount AS received, 0 AS sent, 0 AS gas_spent, h.block_number
+        FROM transactionhistory h JOIN address a ON a.address = h.to_address
+        UNION ALL
+        SELECT h.from_address, h.asset, 0, h.amount, 0, h.block_number
+        FROM transactionhistory h JOIN address a ON a.address = h.from_address
+        UNION ALL
+        SELECT * FROM (
+            -- the gas of a transaction once per sender, from any of its rows
+            SELECT DISTINCT ON (h.transaction_hash, h.from_address) h.from_address, 'ETH', 0, 0,
+                   h.gas::numeric * h.gas_price * 0.000000000000000001, h.block_number
+            FROM transactionhistory h JOIN address a ON a.address = h.from_address
+        ) gas
+    ) moves
+    GROUP BY address, asset
+"""
+
+def count_ledger_mismatches(*, session: Session) -> int:
+    """(address, asset) pairs whose ledger row differs from their history, or is missing on either side."""
+    statement = text(f"""
+        SELECT count(*) FROM ({LEDGER_FROM_HISTORY}) expected
+        FULL JOIN balanceledger l USING (address, asset)
+        WHERE (expected.received, expected.sent, expected.gas_spent, expected.balance, expected.block_number)
+              IS DISTINCT FROM (l.received, l.sent, l.gas_spent, l.balance, l.block_number)
+    """)
+    return session.exec(statement).scalar_one()
+
+def rebuild_balance_ledger(*, session: Session) -> int:
+    # blocks the ledger trigger of concurrent history inserts until the commit
+    session.exec(text("LOCK TABLE balanceledger IN EXCLUSIVE MODE"))
+    session.exec(text("DELETE FROM balanceledger"))
+    statement = text(f"""
+        INSERT INTO balanceledger (address, asset, received, sent, gas_spent, balance, block_number, updated_at)
+        SELECT address, asset, received, sent, gas_spent, balance, block_number, now() FROM ({LEDGER_FROM_HISTORY}) expected
+    """)
+    return session.exec(statement).rowcount
+
+def get_indexer_checkpoint(*, session: Session, name: str) -> int | None:
+    checkpoint = session.get(IndexerCheckpoint, name)
+    return checkpoint.block_number if checkpoint else None
+
+def set_indexer_checkpoint(*, session: Session, name: str, block_number: int) -> None:
+    """Moves the checkpoint forward to block_number, never back."""
+    statement = pg_insert(IndexerCheckpoint).values(name=name, block_number=block_number)
+    statement = statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"block_number": func.greatest(IndexerCheckpoint.block_number, statement.excluded.block_number),
+              "updated_at": func.now()})
+    session.exec(statement)
+
+def lock_address_nonce(*, session: Session, address: str) -> AddressNonce | None:
+    statement = select(AddressNonce).where(AddressNonce.address == address).with_for_update()
+    return session.exec(statement).first()
+
+def create_address_nonce(*, session: Session, address: str, next_nonce: int) -> None:
+    session.exec(pg_insert(AddressNonce).values(address=address, next_nonce=next_nonce).on_conflict_do_nothing())
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.integration.web3_integration import (
+    LRUCache, balance_cache, balance_calls, balance_key, cached_results, code_cache, decode_balances,
+    format_batch_responses, note_head, receipt_cache, remember_code, remember_receipt, remember_transaction,
+    results_by_key, transaction_cache,
+)
+from decimal import Decimal
+from typing import Any
+from web3.types import TxData, TxReceipt
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+web3 = settings.ASYNC_WEB3_PROVIDER
+
+# shares the final-data caches of web3_integration
+
+async def get_transaction(tx_hash: str) -> TxData:
+    if (tx := transaction_cache.get(tx_hash.lower())) is not None:
+        return tx
+    try:
+        tx = await web3.eth.get_transaction(tx_hash)
+        remember_transaction(tx_hash, tx)
+        return tx
+    except Exception as e:
+        logger.error("Error retrieving transaction: %s", e)
+        raise e
+
+async def get_transaction_receipt(tx_hash: str) -> TxReceipt | None:
+    if (tx_receipt := receipt_cache.get(tx_hash.lower())) is not None:
+        return tx_receipt
+    try:
+        tx_receipt = await web3.eth.get_transaction_receipt(tx_hash)
+        remember_receipt(tx_hash, tx_receipt)
+        return tx_receipt
+    except Exception as e:
+        logger.error("Error retrieving transaction receipt: %s", e)
+        raise e
+
+async def get_block_number() -> int:
+    try:
+        block_number = await web3.eth.block_number
+        note_head(block_number)
+        return block_number
+    except Exception as e:
+        logger.error("Error retrieving block number: %s", e)
+        raise e
+
+async def get_code(address: str) -> bytes:
+    if (code := code_cache.get(address.lower())) is not None:
+        return code
+    try:
+        code = await web3.eth.get_code(address)
+        remember_code(address, code)
+        return code
+    except Exception as e:
+        logger.error("Error retrieving code for address %s: %s", address, e)
+        raise e
+
+async def batch_request(calls: list[tuple[str, list[Any]]]) -> list[Any]:
+    """
+    Async counterpart of web3_integration.batch_request: one entry per call, in
+    order, with a Web3RPCError for calls the node rejected.
+    """
+    chunks = [calls[start:start + settings.WEB3_BATCH_SIZE] for start in range(0, len(calls), settings.WEB3_BATCH_SIZE)]
+    responses = await asyncio.gather(*(web3.provider.make_batch_request(chunk) for chunk in chunks))
+    results: list[Any] = []
+    for chunk, chunk_responses in zip(chunks, responses):
+        results.extend(format_batch_responses(chunk, chunk_responses))
+    return results
+
+async def _cached_batch_by_key(cache: LRUCache, remember, method: str, keys: list[str], params, description: str) -> dict[str, Any]:
+    results, missing = cached_results(cache, keys)
+    if missing:
+        fetched = await batch_request([(method, params(key)) for key in missing])
+        for key, result in results_by_key(missing, fetched, description).items():
+            remember(key, result)
+            results[key] = result
+    return results
+
+async def get_transactions(tx_hashes: list[str]) -> dict[str, TxData | None]:
+    return await _cached_batch_by_key(transaction_cache, remember_transaction, "eth_getTransactionByHash", tx_hashes,
+                                      lambda h: [h], "transaction")
+
+async def get_transaction_receipts(tx_hashes: list[str]) -> dict[str, TxReceipt | None]:
+    return await _cached_batch_by_key(receipt_cache, remember_receipt, "eth_getTransactionReceipt", tx_hashes,
+                                      lambda h: [h], "transaction receipt")
+
+async def get_codes(addresses: list[str]) -> dict[str, bytes | None]:
+    return await _cached_batch_by_key(code_cache, remember_code, "eth_getCode", addresses,
+                                      lambda a: [a, "latest"], "code")
+
+async def get_balances(addresses: list[str], block_number: int) -> dict[str, dict[str, Decimal] | None]:
+    """
+    ETH and registry token balances of the addresses at block_number, None for
+    an address the node failed to answer. Every call of every address not cached
+    for that block goes out in JSON-RPC batches of WEB3_BATCH_SIZE, sent concurrently.
+    """
+    keys = [balance_key(address, block_number) for address in addresses]
+    cached, missing = cached_results(balance_cache, keys)
+    balances = {address: cached[key] for address, key in zip(addresses, keys)}
+
+    missing_addresses = [address for address, key in zip(addresses, keys) if key in missing]
+    if missing_addresses:
+        calls_per_address = len(balance_calls(missing_addresses[0], block_number))
+        results = await batch_request([call for address in missing_addresses for call in balance_calls(address, block_number)])
+        for i, address in enumerate(missing_addresses):
+            balances[address] = decode_balances(results[i * calls_per_address:(i + 1) * calls_per_address])
+            if balances[address] is not None:
+                balance_cache.put(balance_key(address, block_number).lower(), balances[address])
+    return balances
+
+async def get_confirmed_transaction(tx_hash: str, confirmations_required=settings.CONFIRMATIONS_REQUIRED) -> tuple[TxData, TxReceipt] | None:
+    """
+    Transaction and receipt of tx_hash if it succeeded and has enough confirmations,
+    fetched concurrently, otherwise None.
+    """
+    try:
+        tx, tx_receipt, head = await asyncio.gather(get_transaction(tx_hash), get_transaction_receipt(tx_hash), get_block_number())
+    except Exception as e:
+        logger.error("Error checking transaction: %s", e)
+        return None
+
+    if tx_receipt.get("status") == 1 and head - tx_receipt["blockNumber"] >= confirmations_required:
+        return tx, tx_receipt
+    return None
+
+async def is_contract_transaction(tx: TxData) -> bool:
+    try:
+        code_at_to = await get_code(tx['to'])
+        is_contract = len(code_at_to) > 0
+
+        is_function_call = tx['input'] != '0x'
+
+        return is_contract and is_function_call
+    except Exception as e:
+        logger.error("Error checking if transaction is a contract interaction: %s", e)
+        return False
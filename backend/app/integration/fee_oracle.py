@@ -0,0 +1,103 @@
+import logging
+import statistics
+import threading
+import time
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from app.core.config import settings
+from app.integration import web3_integration
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FeeSnapshot(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    block_number: int
+    gas_price: int
+    base_fee: Optional[int]  # None when the chain has no EIP-1559 fee market
+    priority_fee: int
+    fetched_at: float
+
+    @property
+    def eip1559(self) -> bool:
+        return settings.USE_EIP1559 and self.base_fee is not None
+
+    @property
+    def max_fee_per_gas(self) -> int:
+        return self.base_fee * settings.BASE_FEE_MULTIPLIER + self.priority_fee
+
+    @property
+    def max_gas_price(self) -> int:
+        """Upper bound paid per unit of gas, used to check the sender can afford the transaction."""
+        return self.max_fee_per_gas if self.eip1559 else self.gas_price
+
+    def fee_fields(self) -> dict[str, int]:
+        if self.eip1559:
+            return {"maxFeePerGas": self.max_fee_per_gas, "maxPriorityFeePerGas": self.priority_fee}
+        return {"gasPrice": self.gas_price}
+
+_snapshot: FeeSnapshot | None = None
+_lock = threading.Lock()
+_refresher: threading.Thread | None = None
+
+def apply_gas_buffer(estimated_gas: int) -> int:
+    return int(estimated_gas * settings.GAS_LIMIT_BUFFER)
+
+def fetch_fees(block_number: int) -> FeeSnapshot:
+    fee_history, gas_price = web3_integration.batch_request([
+        ("eth_feeHistory", [hex(settings.FEE_HISTORY_BLOCKS), "latest", [settings.FEE_PRIORITY_PERCENTILE]]),
+        ("eth_gasPrice", []),
+    ])
+    if isinstance(gas_price, Exception):
+        raise gas_price
+
+    if isinstance(fee_history, Exception) or not fee_history.get("baseFeePerGas"):
+        return FeeSnapshot(block_number=block_number, gas_price=gas_price, base_fee=None,
+                           priority_fee=0, fetched_at=time.time())
+
+    # the last entry is the base fee of the next block
+    base_fee = fee_history["baseFeePerGas"][-1]
+    rewards = [reward[0] for reward in fee_history.get("reward") or [] if reward]
+    priority_fee = int(statistics.median(rewards)) if rewards else max(gas_price - base_fee, 0)
+    return FeeSnapshot(block_number=block_number, gas_price=gas_price, base_fee=base_fee,
+                       priority_fee=priority_fee, fetched_at=time.time())
+
+def refresh() -> FeeSnapshot:
+    global _snapshot
+    block_number = web3_integration.get_block_number()
+    if _snapshot is not None and _snapshot.block_number == block_number:
+        return _snapshot
+
+    snapshot = fetch_fees(block_number)
+    with _lock:
+        _snapshot = snapshot
+    return snapshot
+
+def _refresh_forever() -> None:
+    while True:
+        try:
+            refresh()
+        except Exception as e:
+            logger.warning("Error refreshing fees, serving the last snapshot: %s", e)
+        time.sleep(settings.FEE_ORACLE_POLL_SECONDS)
+
+def start() -> None:
+    global _refresher
+    with _lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_forever, name="fee-oracle", daemon=True)
+            _refresher.start()
+
+def get_fees() -> FeeSnapshot:
+    """
+    Current fees from memory. Only the very first call in a process waits on the
+    node; after that a background thread refreshes the snapshot once per block.
+    """
+    start()
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = refresh()
+    return snapshot
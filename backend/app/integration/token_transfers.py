@@ -0,0 +1,55 @@
+from decimal import Decimal
+from functools import cache
+from typing import Any, NamedTuple
+
+from eth_utils import to_checksum_address
+from web3 import Web3
+
+from app.core.config import settings
+
+TRANSFER_TOPIC = bytes(Web3.keccak(text="Transfer(address,address,uint256)"))
+
+class TokenTransfer(NamedTuple):
+    log_index: int
+    asset: str
+    from_address: str
+    to_address: str
+    amount: Decimal
+
+@cache
+def _tokens_by_address() -> dict[bytes, Any]:
+    return {bytes.fromhex(address[2:]): token for address, token in settings.token_by_contract_address.items()}
+
+def _to_bytes(value: bytes | str) -> bytes:
+    # receipts from web3 carry HexBytes, raw JSON-RPC results carry hex strings
+    return value if isinstance(value, bytes) else bytes.fromhex(value[2:])
+
+def decode_transfers(logs: list[Any]) -> list[TokenTransfer]:
+    """
+    Every ERC-20 Transfer of a known token in the receipt logs, decoded straight
+    from the topics and data instead of going through web3's ABI machinery.
+    """
+    tokens = _tokens_by_address()
+    transfers = []
+    for log in logs:
+        topics = log["topics"]
+        # ERC-721 Transfer shares topic0 but indexes the token id as a fourth topic
+        if len(topics) != 3 or _to_bytes(topics[0]) != TRANSFER_TOPIC:
+            continue
+        if (token := tokens.get(_to_bytes(log["address"]))) is None:
+            continue
+
+        value = int.from_bytes(_to_bytes(log["data"]), "big")
+        transfers.append(TokenTransfer(log_index=log["logIndex"], asset=token["symbol"],
+                                       from_address=to_checksum_address(_to_bytes(topics[1])[-20:]),
+                                       to_address=to_checksum_address(_to_bytes(topics[2])[-20:]),
+                                       amount=Decimal(value).scaleb(-token["decimals"])))
+    return transfers
+
+def find_transfer(logs: list[Any], asset: str, from_address: str, to_address: str) -> TokenTransfer | None:
+    """The first transfer of asset from from_address to to_address in the receipt logs, e.g. the one of a transfer() call."""
+    for transfer in decode_transfers(logs):
+        if (transfer.asset == asset and transfer.from_address.lower() == from_address.lower()
+                and transfer.to_address.lower() == to_address.lower()):
+            return transfer
+    return None
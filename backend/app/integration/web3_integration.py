@@ -1,32 +1,288 @@
+import logging
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable
+
 from app.core.config import settings
-from web3.types import Wei, TxReceipt
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from web3.exceptions import Web3RPCError
+from web3.types import BlockData, LogReceipt, Wei, TxData, TxReceipt
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 web3 = settings.WEB3_PROVIDER
 
+class LRUCache:
+    """Thread-safe bounded LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+# Read-through caches for chain data that can no longer change: transactions and
+# receipts at least CONFIRMATIONS_REQUIRED deep, and deployed contract code.
+# Pending or not yet final data is never cached.
+transaction_cache = LRUCache(settings.CHAIN_CACHE_SIZE)
+receipt_cache = LRUCache(settings.CHAIN_CACHE_SIZE)
+code_cache = LRUCache(settings.CHAIN_CACHE_SIZE)
+# ETH and token balances read at a given block, keyed by block and address;
+# entries of past blocks simply age out
+balance_cache = LRUCache(settings.BALANCE_CACHE_SIZE)
+_last_head: int | None = None
+# called with the new head whenever a call sees the chain move forward
+_head_listeners: list[Callable[[int], None]] = []
+
+def add_head_listener(listener: Callable[[int], None]) -> None:
+    _head_listeners.append(listener)
+
+def note_head(block_number: int) -> None:
+    global _last_head
+    if _last_head is None or block_number > _last_head:
+        _last_head = block_number
+        for listener in _head_listeners:
+            listener(block_number)
+
+def is_final(block_number: int | None) -> bool:
+    return block_number is not None and _last_head is not None and _last_head - block_number >= settings.CONFIRMATIONS_REQUIRED
+
+def remember_transaction(tx_hash: str, tx: TxData | None) -> None:
+    if tx is not None and is_final(tx.get("blockNumber")):
+        transaction_cache.put(tx_hash.lower(), tx)
+
+def remember_receipt(tx_hash: str, tx_receipt: TxReceipt | None) -> None:
+    if tx_receipt is not None and is_final(tx_receipt.get("blockNumber")):
+        receipt_cache.put(tx_hash.lower(), tx_receipt)
+
+def remember_code(address: str, code: bytes | None) -> None:
+    # an empty account can still get code deployed to it, contract code is immutable
+    if code:
+        code_cache.put(address.lower(), code)
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {"transactions": transaction_cache.stats(), "receipts": receipt_cache.stats(), "code": code_cache.stats()}
+
+def batch_request(calls: list[tuple[str, list[Any]]]) -> list[Any]:
+    """
+    Sends the (method, params) calls as JSON-RPC batches of WEB3_BATCH_SIZE and
+    returns one entry per call, in order: the formatted result, or a Web3RPCError
+    for calls the node rejected, so one bad call doesn't fail the others.
+    """
+    results: list[Any] = []
+    for start in range(0, len(calls), settings.WEB3_BATCH_SIZE):
+        chunk = calls[start:start + settings.WEB3_BATCH_SIZE]
+        results.extend(format_batch_responses(chunk, web3.provider.make_batch_request(chunk)))
+    return results
+
+def format_batch_responses(chunk: list[tuple[str, list[Any]]], responses) -> list[Any]:
+    if not isinstance(responses, list):
+        # the node rejected the batch as a whole
+        raise Web3RPCError(str(responses.get("error")), rpc_response=responses)
+
+    results: list[Any] = []
+    for (method, _), response in zip(chunk, responses):
+        if "error" in response:
+            results.append(Web3RPCError(str(response["error"]), rpc_response=response))
+            continue
+        result = format_result(method, response.get("result"))
+        # same shape as web3's own calls, which go through the attrdict middleware
+        results.append(AttributeDict.recursive(result) if isinstance(result, dict) else result)
+    return results
+
+# Raw JSON-RPC results are decoded the way web3's own calls return them:
+# quantities as int, addresses checksummed, any other hex data as HexBytes.
+# Only the block nonce differs, it comes back as an int.
+QUANTITY_RESULTS = frozenset({"eth_blockNumber", "eth_chainId", "eth_estimateGas", "eth_gasPrice", "eth_getBalance",
+                              "eth_getTransactionCount", "eth_maxPriorityFeePerGas"})
+DATA_RESULTS = frozenset({"eth_call", "eth_getCode", "eth_getStorageAt"})
+QUANTITY_FIELDS = frozenset({
+    "amount", "baseFeePerGas", "blobGasPrice", "blobGasUsed", "blockNumber", "chainId", "cumulativeGasUsed",
+    "difficulty", "effectiveGasPrice", "excessBlobGas", "gas", "gasLimit", "gasPrice", "gasUsed", "index", "logIndex",
+    "maxFeePerBlobGas", "maxFeePerGas", "maxPriorityFeePerGas", "nonce", "number", "oldestBlock", "reward", "size",
+    "status", "timestamp", "totalDifficulty", "transactionIndex", "type", "v", "validatorIndex", "value", "yParity",
+})
+ADDRESS_FIELDS = frozenset({"address", "contractAddress", "from", "miner", "to"})
+
+def format_result(method: str, result: Any) -> Any:
+    if result is None:
+        return None
+    if method in QUANTITY_RESULTS:
+        return int(result, 16)
+    if method in DATA_RESULTS:
+        return HexBytes(result)
+    return _format_field(None, result)
+
+def _format_field(name: str | None, value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _format_field(key, item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_format_field(name, item) for item in value]
+    if not isinstance(value, str) or not value.startswith("0x"):
+        return value
+    if name in QUANTITY_FIELDS:
+        return int(value, 16)
+    if name in ADDRESS_FIELDS:
+        return Web3.to_checksum_address(value)
+    return HexBytes(value)
+
+def results_by_key(keys: list[str], results: list[Any], description: str, keep_errors: bool = False) -> dict[str, Any]:
+    """Results per key; the calls the node failed are None, or their error with keep_errors."""
+    by_key = {}
+    for key, result in zip(keys, results):
+        if isinstance(result, Exception):
+            logger.warning("Error retrieving %s for %s: %s", description, key, result)
+            result = result if keep_errors else None
+        by_key[key] = result
+    return by_key
+
+def _batch_by_key(method: str, keys: list[str], params: list[list[Any]], description: str,
+                  keep_errors: bool = False) -> dict[str, Any]:
+    return results_by_key(keys, batch_request([(method, p) for p in params]), description, keep_errors)
+
+def cached_results(cache: LRUCache, keys: list[str]) -> tuple[dict[str, Any], list[str]]:
+    """Cached entries for keys, and the keys still to be fetched."""
+    results = {key: cache.get(key.lower()) for key in keys}
+    return results, [key for key in keys if results[key] is None]
+
+def _cached_batch_by_key(cache: LRUCache, remember, method: str, keys: list[str], params, description: str,
+                         keep_errors: bool = False) -> dict[str, Any]:
+    results, missing = cached_results(cache, keys)
+    fetched = _batch_by_key(method, missing, [params(key) for key in missing], description, keep_errors) if missing else {}
+    for key, result in fetched.items():
+        if not isinstance(result, Exception):
+            remember(key, result)
+        results[key] = result
+    return results
+
+BALANCE_OF_SELECTOR = "0x70a08231"  # balanceOf(address)
+
+def balance_key(address: str, block_number: int) -> str:
+    return f"{block_number}:{address}"
+
+def balance_calls(address: str, block_number: int) -> list[tuple[str, list[Any]]]:
+    """eth_getBalance and one balanceOf eth_call per registry token, at block_number."""
+    block = hex(block_number)
+    calls: list[tuple[str, list[Any]]] = [("eth_getBalance", [address, block])]
+    for token in settings.token_by_symbol.values():
+        data = BALANCE_OF_SELECTOR + address[2:].lower().rjust(64, "0")
+        calls.append(("eth_call", [{"to": token["address"], "data": data}, block]))
+    return calls
+
+def decode_balances(results: list[Any]) -> dict[str, Decimal] | None:
+    """Balances per asset from the results of balance_calls, None if any call failed."""
+    if any(isinstance(result, Exception) for result in results):
+        return None
+    eth, *raw_balances = results
+    balances = {"ETH": Web3.from_wei(eth, "ether")}
+    for (symbol, token), raw in zip(settings.token_by_symbol.items(), raw_balances):
+        # an address without code answers eth_call with no data
+        balances[symbol] = Decimal(int.from_bytes(raw, "big") if raw else 0).scaleb(-token["decimals"])
+    return balances
+
+def get_transactions(tx_hashes: list[str], keep_errors: bool = False) -> dict[str, TxData | Exception | None]:
+    return _cached_batch_by_key(transaction_cache, remember_transaction, "eth_getTransactionByHash", tx_hashes,
+                                lambda h: [h], "transaction", keep_errors)
+
+def get_transaction_receipts(tx_hashes: list[str], keep_errors: bool = False) -> dict[str, TxReceipt | Exception | None]:
+    return _cached_batch_by_key(receipt_cache, remember_receipt, "eth_getTransactionReceipt", tx_hashes,
+                                lambda h: [h], "transaction receipt", keep_errors)
+
+def get_codes(addresses: list[str]) -> dict[str, bytes | None]:
+    return _cached_batch_by_key(code_cache, remember_code, "eth_getCode", addresses,
+                                lambda a: [a, "latest"], "code")
+
+def get_eth_balances(addresses: list[str]) -> dict[str, Wei | None]:
+    return _batch_by_key("eth_getBalance", addresses, [[a, "latest"] for a in addresses], "ETH balance")
+
+def get_blocks(block_numbers: list[int]) -> dict[int, BlockData | None]:
+    """Blocks with their full transactions, in batched requests."""
+    return _batch_by_key("eth_getBlockByNumber", block_numbers, [[hex(n), True] for n in block_numbers], "block")
+
+def get_logs(from_block: int, to_block: int, addresses: list[str], topics: list[Any]) -> list[LogReceipt]:
+    try:
+        return web3.eth.get_logs({"fromBlock": from_block, "toBlock": to_block, "address": addresses, "topics": topics})
+    except Exception as e:
+        logger.error("Error retrieving logs for blocks %s-%s: %s", from_block, to_block, e)
+        raise e
+
 def get_transaction(tx_hash: str):
+    if (tx := transaction_cache.get(tx_hash.lower())) is not None:
+        return tx
     try:
-        return web3.eth.get_transaction(tx_hash)
+        tx = web3.eth.get_transaction(tx_hash)
+        remember_transaction(tx_hash, tx)
+        return tx
     except Exception as e:
-        print(f"Error retrieving transaction: {e}")
+        logger.error("Error retrieving transaction: %s", e)
         raise e
 
 def get_transaction_receipt(tx_hash: str) -> TxReceipt | None:
+    if (tx_receipt := receipt_cache.get(tx_hash.lower())) is not None:
+        return tx_receipt
+    try:
+        tx_receipt = web3.eth.get_transaction_receipt(tx_hash)
+        remember_receipt(tx_hash, tx_receipt)
+        return tx_receipt
+    except Exception as e:
+        logger.error("Error retrieving transaction receipt: %s", e)
+        raise e
+
+def get_code(address: str) -> bytes:
+    if (code := code_cache.get(address.lower())) is not None:
+        return code
+    try:
+        code = web3.eth.get_code(address)
+        remember_code(address, code)
+        return code
+    except Exception as e:
+        logger.error("Error retrieving code for address %s: %s", address, e)
+        raise e
+
+def get_block_number() -> int:
     try:
-        return web3.eth.get_transaction_receipt(tx_hash)
+        block_number = web3.eth.block_number
+        note_head(block_number)
+        return block_number
     except Exception as e:
-        print(f"Error retrieving transaction receipt: {e}")
+        logger.error("Error retrieving block number: %s", e)
         raise e
 
 def confirmations(tx_hash):
-  tx = web3.eth.get_transaction(tx_hash)
-  return web3.eth.block_number - tx.blockNumber
+  tx = get_transaction(tx_hash)
+  return get_block_number() - tx.blockNumber
 
-def is_transaction_confirmed(tx_hash, confirmations_required=6) -> bool:
+def is_transaction_confirmed(tx_hash, confirmations_required=settings.CONFIRMATIONS_REQUIRED) -> bool:
     try:
         tx_receipt = get_transaction_receipt(tx_hash)
         return tx_receipt.get("status") == 1 and confirmations(tx_hash) >= confirmations_required
     except Exception as e:
-        print(f"Error checking transaction: {e}")
+        logger.error("Error checking transaction: %s", e)
         return False
 
 def is_transaction_failed(tx_hash: str) -> bool:
@@ -45,56 +301,65 @@ def send_transaction(transaction):
         tx_hash = web3.eth.send_transaction(transaction)
         return tx_hash
     except Exception as e:
-        print(f"Error sending transaction: {e}")
+        logger.error("Error sending transaction: %s", e)
         return None
 
 def get_gas_price():
     try:
         return web3.eth.gas_price
     except Exception as e:
-        print(f"Error retrieving gas price: {e}")
+        logger.error("Error retrieving gas price: %s", e)
         return None
 
 def is_contract_transaction(tx_hash: str) -> bool:
     try:
-        tx = web3.eth.get_transaction(tx_hash)
+        tx = get_transaction(tx_hash)
 
-        code_at_to = web3.eth.get_code(tx['to'])
+        code_at_to = get_code(tx['to'])
         is_contract = len(code_at_to) > 0
 
         is_function_call = tx['input'] != '0x'
 
         return is_contract and is_function_call
     except Exception as e:
-        print(f"Error checking if transaction is a contract interaction: {e}")
+        logger.error("Error checking if transaction is a contract interaction: %s", e)
         return False
 
-def get_address_nonce(address: str) -> int:
+def get_address_nonce(address: str, block_identifier: str = "latest") -> int:
     try:
-        return web3.eth.get_transaction_count(address)
+        return web3.eth.get_transaction_count(address, block_identifier)
     except Exception as e:
-        print(f"Error retrieving nonce for address {address}: {e}")
+        logger.error("Error retrieving nonce for address %s: %s", address, e)
         raise e
 
-def sign_and_send_transaction(transaction, private_key: str) -> str:
-    try:
-        signed_tx = web3.eth.account.sign_transaction(transaction, private_key)
-        tx_hash = web3.eth.send_raw_transaction(signed_tx["raw_transaction"])
-        return web3.to_hex(tx_hash)
-    except Exception as e:
-        print(f"Error signing and sending transaction: {e}")
-        raise e
+# node replies rejecting a transaction before it enters the pool. After any
+# other error of a send (a timeout, "already known", "nonce too low") the node
+# may have the transaction, and it must not be signed again under another nonce.
+REJECTED_SEND_ERRORS = ("insufficient funds", "intrinsic gas too low", "exceeds block gas limit", "underpriced",
+                        "fee cap", "less than block base fee", "invalid sender")
+
+def is_rejected_send(error: Exception) -> bool:
+    message = str(error).lower()
+    return isinstance(error, Web3RPCError) and any(e in message for e in REJECTED_SEND_ERRORS)
+
+def sign_transaction(transaction, private_key: str) -> tuple[str, bytes]:
+    """Hash and raw bytes of the signed transaction; the hash is known before it is sent."""
+    signed_tx = web3.eth.account.sign_transaction(transaction, private_key)
+    return web3.to_hex(signed_tx.hash), signed_tx.raw_transaction
+
+def send_raw_transaction(raw_transaction: bytes) -> str:
+    return web3.to_hex(web3.eth.send_raw_transaction(raw_transaction))
 
 def get_eth_balance(address: str) -> Wei:
     try:
         return web3.eth.get_balance(address)
     except Exception as e:
-        print(f"Error retrieving ETH balance for address {address}: {e}")
+        logger.error("Error retrieving ETH balance for address %s: %s", address, e)
         return Wei(0)
 
 def get_transaction_estimate(transaction) -> int:
     try:
         return web3.eth.estimate_gas(transaction)
     except Exception as e:
-        print(f"Error estimating gas for transaction: {e}")
+        logger.error("Error estimating gas for transaction: %s", e)
         return 0
\ No newline at end of file
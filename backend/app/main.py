@@ -1,19 +1,36 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 
 from app.api.main import api_router
 from app.core.config import settings
-from app.scheduler import schedulers
+from app.service import address_index
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # started with the server rather than on import, so that importing the app
+    # (tests, scripts) starts no threads
+    address_index.start()
+    # background jobs run in the worker (python -m app.worker)
+    if settings.API_RUN_SCHEDULER:
+        from app.scheduler import schedulers
+
+        scheduler = schedulers.start_scheduler()
+        yield
+        schedulers.stop_scheduler(scheduler)
+    else:
+        yield
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
-scheduler = schedulers.start_scheduler()
-
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -1,14 +1,15 @@
 import uuid
 from datetime import datetime
 from decimal import Decimal
-from sqlmodel import Field, SQLModel, Column, DateTime, func, BigInteger
+from sqlalchemy import text
+from sqlmodel import Field, SQLModel, Column, DateTime, func, BigInteger, Index, Numeric, UniqueConstraint
 from typing import Optional
 
 from app.api.models.models import AddressCreationStatus, TransactionStatus
 
 class AddressCreationJob(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    quantity: int = Field(default=1, ge=1, le=1000)
+    quantity: int = Field(default=1, ge=1, le=1_000_000)
     status: AddressCreationStatus = Field(default=AddressCreationStatus.PENDING, max_length=20)
     created_at: datetime = Field(
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
@@ -16,15 +17,58 @@ class AddressCreationJob(SQLModel, table=True):
     updated_at: datetime = Field(
         sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     )
+    first_index: Optional[int] = Field(default=None, sa_column=Column(BigInteger),
+                                       description="First wallet index of the job, reserved when it first runs")
+    end_index: Optional[int] = Field(default=None, sa_column=Column(BigInteger),
+                                     description="End of the wallet indexes of the job, past the ones already taken in its range")
+    generated_count: int = Field(default=0, description="Addresses generated and committed so far")
+    started_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    completed_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    attempts: int = Field(default=0, description="Runs of the job that failed")
+    last_error: Optional[str] = Field(default=None, max_length=500, description="Error of the last failed run")
+    next_attempt_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)),
+                                                description="When a failed job is run again")
+    claimed_by: Optional[str] = Field(default=None, max_length=100, description="Worker holding the lease on the job")
+    lease_expires_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)),
+                                                 description="Until when the job is leased to claimed_by")
 
 class Address(SQLModel, table=True):
+    __table_args__ = (
+        # refreshes of app.service.address_index read the rows created since a watermark
+        Index("ix_address_created_at_id", "created_at", "id"),
+        # keyset pagination of GET /address walks the addresses handed out, by (assigned_at, id)
+        Index("ix_address_assigned_at_id", "assigned_at", "id", postgresql_where=text("assigned_at IS NOT NULL")),
+        # the warm pool, see app.service.address_pool
+        Index("ix_address_pool_index", "index", postgresql_where=text("assigned_at IS NULL")),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     address: str = Field(unique=True, index=True, max_length=42)
-    index: int = Field(..., sa_column=Column(BigInteger), ge=0, le=2**32 - 1, description="Index of the address in the wallet")
+    index: int = Field(..., sa_column=Column(BigInteger, index=True), ge=0, le=2**32 - 1, description="Index of the address in the wallet")
+    assigned_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)),
+                                            description="When the address was handed out, NULL while in the pool")
     created_at: datetime = Field(
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
     )
 
+class AddressIndexCounter(SQLModel, table=True):
+    mnemonic: str = Field(primary_key=True, max_length=20, description="Wallet whose derivation indexes are allocated")
+    next_index: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+
+class AddressNonce(SQLModel, table=True):
+    address: str = Field(primary_key=True, max_length=42)
+    next_nonce: int = Field(default=0, sa_column=Column(BigInteger, nullable=False), description="Next nonce to be used by the address")
+    updated_at: Optional[datetime] = Field(default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    )
+
+class IndexerCheckpoint(SQLModel, table=True):
+    name: str = Field(primary_key=True, max_length=50)
+    block_number: int = Field(sa_column=Column(BigInteger, nullable=False), description="Last block fully indexed")
+    updated_at: Optional[datetime] = Field(default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    )
+
 class Transaction(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     from_address: str = Field(
@@ -49,6 +93,19 @@ class Transaction(SQLModel, table=True):
     )
     transaction_hash: Optional[str] = Field(default=None, unique=True, index=True, max_length=66)
     block_number: Optional[int] = Field(default=None, ge=0, description="Block number in which the transaction was included")
+    gas_used: Optional[int] = Field(default=None, sa_column=Column(BigInteger), description="Gas used, from the receipt")
+    effective_gas_price: Optional[int] = Field(default=None, sa_column=Column(BigInteger), description="Effective gas price in wei, from the receipt")
+    gas_limit: Optional[int] = Field(default=None, description="Gas limit estimated for the transfer, used to fund the sender")
+    log_index: Optional[int] = Field(default=None, ge=0, description="Index of the token Transfer log in the receipt, NULL for ETH")
+    missing_since_block: Optional[int] = Field(default=None, sa_column=Column(BigInteger),
+                                               description="Head at which the node first knew nothing of the STARTED transaction")
+    attempts: int = Field(default=0, description="Failed broadcast attempts")
+    next_attempt_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)),
+                                                description="Earliest time a RETRYING transaction is broadcast again")
+    last_error: Optional[str] = Field(default=None, max_length=500, description="Error of the last failed broadcast attempt")
+    claimed_by: Optional[str] = Field(default=None, max_length=100, description="Worker holding the lease on the transaction")
+    lease_expires_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)),
+                                                 description="Until when the transaction is leased to claimed_by")
     created_at: Optional[datetime] = Field(default=None,
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
     )
@@ -58,8 +115,19 @@ class Transaction(SQLModel, table=True):
     status: TransactionStatus = Field(default=TransactionStatus.PENDING, max_length=20, description="Status of the transaction (pending, confirmed, failed)")
 
 class TransactionHistory(SQLModel, table=True):
+    # one index per side of the transfer, history reads are a UNION ALL of both
+    __table_args__ = (
+        Index("ix_transactionhistory_from_address_created_at_id", "from_address", "created_at", "id"),
+        Index("ix_transactionhistory_to_address_created_at_id", "to_address", "created_at", "id"),
+        # a transaction can carry several token transfers, one row per log;
+        # ETH transfers have no log and stay unique per hash
+        UniqueConstraint("transaction_hash", "log_index", name="uq_transactionhistory_transaction_hash_log_index",
+                         postgresql_nulls_not_distinct=True),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    transaction_hash: str = Field(unique=True, index=True, max_length=66)
+    transaction_hash: str = Field(index=True, max_length=66)
+    log_index: Optional[int] = Field(default=None, ge=0, description="Índice do log da transferência de token no recibo")
     from_address: str = Field(
         ...,
         description="Endereço de origem do saldo a ser transferido",
@@ -83,6 +151,7 @@ class TransactionHistory(SQLModel, table=True):
     gas: int
     gas_price: int = Field(
         ...,
+        sa_column=Column(BigInteger, nullable=False),
         description="Preço do gás em wei (formato Decimal)",
         ge=0
     )
@@ -93,4 +162,20 @@ class TransactionHistory(SQLModel, table=True):
     )
     created_at: datetime = Field(
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+
+class BalanceLedger(SQLModel, table=True):
+    # net position of our addresses per asset, kept up to date from the
+    # TransactionHistory inserts by a trigger (see app.core.db)
+    address: str = Field(primary_key=True, max_length=42)
+    asset: str = Field(primary_key=True, max_length=20)
+    received: Decimal = Field(default=Decimal(0), sa_column=Column(Numeric, nullable=False))
+    sent: Decimal = Field(default=Decimal(0), sa_column=Column(Numeric, nullable=False))
+    gas_spent: Decimal = Field(default=Decimal(0), sa_column=Column(Numeric, nullable=False),
+                               description="ETH paid in gas by the address, on its ETH row")
+    balance: Decimal = Field(default=Decimal(0), sa_column=Column(Numeric, nullable=False),
+                             description="received - sent - gas_spent")
+    block_number: int = Field(sa_column=Column(BigInteger, nullable=False), description="Highest block of the history applied")
+    updated_at: Optional[datetime] = Field(default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     )
\ No newline at end of file
@@ -1,15 +1,22 @@
+import threading
 from contextlib import contextmanager
 
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
-from sqlmodel import Session
+from sqlmodel import Session, func
 
 from app import crud
 from app.api.models.models import AddressCreationStatus, TransactionStatus
-from app.core.db import engine
-from app.utils import get_private_key_from_index
+from app.core.db import ADDRESS_JOBS_CHANNEL, ADDRESS_POOL_CHANNEL, TRANSACTIONS_CHANNEL, engine
+from app.models import AddressCreationJob, Transaction
 
 from app.core.config import settings
-from app.integration import web3_integration
+from app.integration import fee_oracle, token_transfers, web3_integration
+from app.scheduler import wakeups
+from app.service import (
+    address_index, address_pool, broadcast_service, deposit_indexer, gas_funding_service, lease_service, ledger_service,
+    nonce_service,
+)
 
 import logging
 
@@ -21,86 +28,130 @@ def get_db_session():
     with Session(engine) as session:
         yield session
 
-def create_address_job():
+def create_address_job() -> bool:
+    """Runs the oldest address job no other worker holds, if any, and tells whether there was one."""
     with get_db_session() as session:
-        job = crud.get_create_address_jobs(session=session)
-        if job:
-            crud.create_addresses(session=session, quantity=job.quantity)
-            job.status = AddressCreationStatus.COMPLETED
-            session.add(job)
-            session.commit()
+        job = crud.claim_address_job(session=session, worker_id=lease_service.worker_id())
+        session.commit()
+        if not job:
+            return False
+        with lease_service.heartbeat(AddressCreationJob, [job.id]):
+            try:
+                crud.generate_job_addresses(session=session, job=job)
+                job.status = AddressCreationStatus.COMPLETED
+                job.completed_at = func.now()
+                session.add(job)
+                session.commit()
+            except Exception as e:
+                # the job is run again after a backoff, from its last chunk, until ADDRESS_JOB_MAX_ATTEMPTS
+                logger.error("Address job %s failed: %s", job.id, e)
+                crud.fail_address_job_run(session=session, job=job, error=e)
+        address_index.refresh()
+        return True
+
+def run_address_jobs():
+    while create_address_job():
+        pass
 
 def check_pending_transaction():
-    with get_db_session() as session:
-        transactions = crud.get_transactions_by_status(session=session, status=TransactionStatus.PENDING)
-        for t in transactions:
-
-            token = settings.token_by_symbol.get(t.asset)
-            token_contract = token.get("contract")
-            decimals = token.get("decimals")
-            value = int(t.amount * (10 ** decimals))
-
-            balance = web3_integration.get_eth_balance(t.from_address)
-            nonce = web3_integration.get_address_nonce(t.from_address)
-
-            new_tx = token_contract.functions.transfer(t.to_address, value).build_transaction({
-                'from': t.from_address,
-                'nonce': nonce,
-                'chainId': int(settings.CHAIN_ID),
-                "gas": 65000,  # Default gas for most ERC20 transfers
-                "gasPrice": web3_integration.get_gas_price(),
-            })
-
-            estimated_gas = web3_integration.get_transaction_estimate(new_tx)
-            if estimated_gas == 0:
-                estimated_gas = 65000  # Default gas for most ERC20 transfers
-            gas_with_buffer = int(estimated_gas * 1.2)
-
-            gas_price = web3_integration.get_gas_price()
-
-            new_tx["gas"] = gas_with_buffer
-            new_tx["gasPrice"] = gas_price
-
-            cost = gas_with_buffer * gas_price
-
-            logger.info("Transaction cost: %s, Balance: %s from wallet %s", cost, balance, t.from_address)
-            if cost > balance:
-                raise ValueError(
-                    "Insufficient funds for transaction. Please ensure you have enough ETH to cover the transfer and gas fees.")
-
-            address = crud.get_address(session=session, address=t.from_address)
+    with Session(engine, expire_on_commit=False) as session:
+        transactions = crud.claim_broadcastable_transactions(session=session, worker_id=lease_service.worker_id(),
+                                                             limit=settings.CLAIM_BATCH_SIZE)
+        session.commit()
+    if not transactions:
+        return
 
-            pk = get_private_key_from_index(address.index)
-            new_tx_hash = web3_integration.sign_and_send_transaction(transaction=new_tx, private_key=pk)
+    with lease_service.heartbeat(Transaction, [t.id for t in transactions]):
+        # senders waiting on a gas top-up are left for a later run
+        awaiting_funding = gas_funding_service.fund_pending(transactions)
+        broadcast_service.broadcast_pending(transactions, skip=awaiting_funding)
 
-            t.transaction_hash = new_tx_hash
-            t.status = TransactionStatus.STARTED
+def check_transaction_finalization():
+    with Session(engine, expire_on_commit=False) as session:
+        head = web3_integration.get_block_number()
 
-            session.add(t)
+        # only transactions whose inclusion block is still unknown need RPC calls
+        transactions = crud.claim_unmined_transactions(session=session, worker_id=lease_service.worker_id(),
+                                                       limit=settings.CLAIM_BATCH_SIZE)
         session.commit()
-
-def check_transaction_finalization():
-    with get_db_session() as session:
-        transactions = crud.get_transactions_by_status(session=session, status=TransactionStatus.STARTED)
-        for t in transactions:
-            if web3_integration.is_transaction_confirmed(tx_hash=t.transaction_hash):
-                tx_receipt = web3_integration.get_transaction_receipt(tx_hash=t.transaction_hash)
-                t.status = TransactionStatus.CONFIRMED
+        with lease_service.heartbeat(Transaction, [t.id for t in transactions]):
+            # calls the node failed come back as their error: the transaction is then unknown, not dropped
+            receipts = web3_integration.get_transaction_receipts([t.transaction_hash for t in transactions], keep_errors=True)
+            unmined = [t for t in transactions if receipts.get(t.transaction_hash) is None]
+            known = web3_integration.get_transactions([t.transaction_hash for t in unmined], keep_errors=True)
+
+            for t in transactions:
+                tx_receipt = receipts.get(t.transaction_hash)
+                if isinstance(tx_receipt, Exception):
+                    continue
+                if tx_receipt is None:
+                    pending = known.get(t.transaction_hash)
+                    if isinstance(pending, Exception):
+                        continue
+                    if pending is not None:
+                        t.missing_since_block = None
+                    elif t.missing_since_block is None:
+                        # may not have reached this node yet, e.g. behind a load balancer
+                        t.missing_since_block = head
+                    elif head - t.missing_since_block >= settings.TRANSACTION_DROPPED_AFTER_BLOCKS:
+                        # dropped from the mempool, its nonce is now a gap
+                        t.status = TransactionStatus.FAILED
+                        nonce_service.resync_nonce(t.from_address)
+                    session.add(t)
+                    continue
+
+                if tx_receipt['status'] == 0:
+                    t.status = TransactionStatus.FAILED
+                elif t.asset != "ETH" and (transfer := token_transfers.find_transfer(tx_receipt['logs'], t.asset, t.from_address, t.to_address)):
+                    # the history row of a token transfer is keyed by its log, as in the validation and indexer paths
+                    t.log_index = transfer.log_index
                 t.block_number = tx_receipt['blockNumber']
+                t.gas_used = tx_receipt['gasUsed']
+                t.effective_gas_price = tx_receipt['effectiveGasPrice']
                 session.add(t)
+            session.flush()
 
-                tx_receipt = web3_integration.get_transaction_receipt(tx_hash=t.transaction_hash)
-                crud.create_transaction_history_from_tx(session=session, tx=t, tx_receipt=tx_receipt)
+            # confirmation is a single statement over every mined transaction, safe to run from any worker
+            confirmed = crud.confirm_transactions(session=session, max_block_number=head - settings.CONFIRMATIONS_REQUIRED)
+            session.commit()
+        logger.info("Head %s: %s transactions confirmed, %s waiting for inclusion", head, confirmed, len(unmined))
 
-            elif web3_integration.is_transaction_failed(tx_hash=t.transaction_hash):
-                t.status = TransactionStatus.FAILED
-                session.add(t)
-        session.commit()
+def index_deposits():
+    deposit_indexer.run()
+
+_loops: list[wakeups.JobLoop] = []
+_listener: threading.Event | None = None
 
 def start_scheduler():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(create_address_job, 'interval', seconds=30, id='create_address_job', replace_existing=True)
-    scheduler.add_job(check_pending_transaction, 'interval', seconds=30, id='transaction_job', replace_existing=True)
-    scheduler.add_job(check_transaction_finalization, 'interval', seconds=30, id='transaction_finalization_job', replace_existing=True)
+    global _listener
+    address_loops = [wakeups.JobLoop(f"address-jobs-{i}", run_address_jobs, settings.ADDRESS_JOB_INTERVAL_SECONDS)
+                     for i in range(settings.ADDRESS_JOB_CONCURRENCY)]
+    transaction_loop = wakeups.JobLoop("transactions", check_pending_transaction, settings.TRANSACTION_JOB_INTERVAL_SECONDS)
+    finalization_loop = wakeups.JobLoop("finalization", check_transaction_finalization, settings.FINALIZATION_JOB_INTERVAL_SECONDS)
+    pool_loops = []
+    if settings.ADDRESS_POOL_ENABLED:
+        pool_loops.append(wakeups.JobLoop("address-pool", address_pool.refill, settings.ADDRESS_POOL_INTERVAL_SECONDS))
+    _loops.extend([*address_loops, *pool_loops, transaction_loop, finalization_loop])
+    for loop in _loops:
+        loop.start()
+    _listener = wakeups.start_listener({ADDRESS_JOBS_CHANNEL: address_loops, ADDRESS_POOL_CHANNEL: pool_loops,
+                                        TRANSACTIONS_CHANNEL: [transaction_loop]})
+    web3_integration.add_head_listener(lambda head: finalization_loop.wake())
+    # the fee oracle polls the head, so every new block wakes the finalization job
+    fee_oracle.start()
+
+    scheduler = BackgroundScheduler(executors={"default": ThreadPoolExecutor(settings.WORKER_THREADS)})
+    if settings.INDEXER_ENABLED:
+        scheduler.add_job(index_deposits, 'interval', seconds=settings.INDEXER_INTERVAL_SECONDS, id='deposit_indexer_job', replace_existing=True)
+    scheduler.add_job(ledger_service.check_ledger, 'interval', seconds=settings.LEDGER_CHECK_INTERVAL_SECONDS,
+                      id='ledger_check_job', replace_existing=True)
     scheduler.start()
-    return scheduler
\ No newline at end of file
+    return scheduler
+
+def stop_scheduler(scheduler) -> None:
+    """Stops taking new work and waits for the running jobs."""
+    if _listener is not None:
+        _listener.set()
+    for loop in _loops:
+        loop.stop()
+    scheduler.shutdown(wait=True)
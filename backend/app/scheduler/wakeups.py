@@ -0,0 +1,73 @@
+import logging
+import threading
+from typing import Callable
+
+import psycopg
+from psycopg import sql
+
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Event-driven runs of the queue jobs. Each job runs in its own thread, right
+# away when woken and otherwise every `interval` seconds as a fallback. Inserts
+# into the queue tables raise a Postgres NOTIFY (triggers in app.core.db) that
+# a listener connection turns into wakeups; the finalization job is woken by
+# new heads instead. A wakeup that arrives while the job runs makes it run
+# again as soon as it is done, so none is lost.
+
+class JobLoop:
+    def __init__(self, name: str, job: Callable[[], object], interval: float) -> None:
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run_forever, name=name, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> None:
+        """Stops the loop once the current run, if any, is done."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run_forever(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.job()
+            except Exception as e:
+                logger.exception("Job %s failed: %s", self.name, e)
+            self._wake.wait(self.interval)
+
+def _listen(channels: dict[str, list[JobLoop]], stop: threading.Event) -> None:
+    url = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while not stop.is_set():
+        try:
+            with psycopg.connect(url, autocommit=True) as conn:
+                for channel in channels:
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                # catch up on whatever was inserted while not listening
+                for loops in channels.values():
+                    for loop in loops:
+                        loop.wake()
+                while not stop.is_set():
+                    for notify in conn.notifies(timeout=1.0):
+                        for loop in channels.get(notify.channel, []):
+                            loop.wake()
+        except Exception as e:
+            logger.warning("Lost the job wakeup listener, reconnecting: %s", e)
+            stop.wait(5)
+
+def start_listener(channels: dict[str, list[JobLoop]]) -> threading.Event:
+    """Wakes the loops of each channel on its notifications. Set the returned event to stop."""
+    stop = threading.Event()
+    threading.Thread(target=_listen, args=(channels, stop), name="job-wakeups", daemon=True).start()
+    return stop
@@ -0,0 +1,185 @@
+import logging
+import math
+import threading
+import time
+from contextlib import AbstractContextManager, nullcontext
+from datetime import datetime
+from typing import Iterable
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import async_crud, crud
+from app.core.config import settings
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# In-process membership index of the Address table. Below
+# ADDRESS_INDEX_BLOOM_THRESHOLD rows it is an exact set; above it, a Bloom filter
+# whose positives are confirmed against the database. It is loaded by a
+# background thread at startup and refreshed every ADDRESS_INDEX_REFRESH_SECONDS
+# and whenever an address job completes in this process. Until it is loaded,
+# lookups go to the database.
+#
+# Addresses created after the last load are missing from the index, so its
+# negatives are confirmed against the rows created since the watermark, in
+# both modes.
+
+class BloomFilter:
+    def __init__(self, capacity: int, bits_per_entry: int) -> None:
+        self.capacity = capacity
+        self.size = max(8, capacity * bits_per_entry)
+        self.hashes = max(1, round(bits_per_entry * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes) -> Iterable[int]:
+        # addresses are keccak outputs, their bytes already are uniform hashes
+        h1 = int.from_bytes(key[:8], "big")
+        h2 = int.from_bytes(key[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: bytes) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+_lock = threading.Lock()
+_members: set[bytes] | BloomFilter | None = None
+_count = 0  # approximate, rows re-read across the watermark floor count again
+_watermark: datetime | None = None
+_refresher: threading.Thread | None = None
+
+def _key(address: str) -> bytes | None:
+    try:
+        return bytes.fromhex(address[2:])
+    except ValueError:
+        return None
+
+ADD_BATCH_SIZE = 10_000
+
+def _add(members: set[bytes] | BloomFilter, session: Session, since: datetime | None,
+         lock: AbstractContextManager = nullcontext()) -> tuple[int, datetime]:
+    """
+    Adds the addresses created since `since` and returns how many, and the
+    watermark of the next load. Members shared with other threads are changed
+    under lock, a batch at a time.
+    """
+    # rows of transactions still open have created_at at or after their start,
+    # so the next load picks them up from the floor read before the rows
+    floor = crud.get_address_refresh_floor(session=session)
+    added = 0
+    batch: list[bytes] = []
+    for address in crud.get_addresses_created_since(session=session, since=since):
+        batch.append(_key(address))
+        if len(batch) == ADD_BATCH_SIZE:
+            added += _add_batch(members, batch, lock)
+    added += _add_batch(members, batch, lock)
+    return added, floor
+
+def _add_batch(members: set[bytes] | BloomFilter, batch: list[bytes], lock: AbstractContextManager) -> int:
+    with lock:
+        for key in batch:
+            members.add(key)
+    added = len(batch)
+    batch.clear()
+    return added
+
+def warm_up() -> None:
+    global _members, _count, _watermark
+    start = time.perf_counter()
+    with Session(engine) as session:
+        total = crud.count_addresses(session=session)
+        if total > settings.ADDRESS_INDEX_BLOOM_THRESHOLD:
+            # room to double before the next rebuild
+            members = BloomFilter(total * 2, settings.ADDRESS_INDEX_BLOOM_BITS_PER_ENTRY)
+        else:
+            members = set()
+        count, floor = _add(members, session, None)
+
+    with _lock:
+        _members, _count, _watermark = members, count, floor
+    logger.info("Address index loaded %s addresses (%s) in %.1fs", count,
+                "bloom filter" if isinstance(members, BloomFilter) else "set", time.perf_counter() - start)
+
+def refresh() -> None:
+    """Adds the addresses created since the last load."""
+    global _count, _watermark
+    if _members is None:
+        return warm_up()
+
+    with Session(engine) as session:
+        # the refresher thread, address jobs and pool refills refresh concurrently
+        added, floor = _add(_members, session, _watermark, _lock)
+    with _lock:
+        _count += added
+        _watermark = floor
+
+    if isinstance(_members, BloomFilter) and _count > _members.capacity:
+        warm_up()
+
+def _refresh_forever() -> None:
+    while True:
+        try:
+            refresh()
+        except Exception as e:
+            logger.warning("Error refreshing the address index: %s", e)
+        time.sleep(settings.ADDRESS_INDEX_REFRESH_SECONDS)
+
+def start() -> None:
+    global _refresher
+    with _lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_forever, name="address-index", daemon=True)
+            _refresher.start()
+
+def _lookup(addresses: Iterable[str]) -> tuple[set[str], list[tuple[list[str], datetime | None]]]:
+    """
+    Addresses known to exist, and the ones only the database can tell, each
+    group with the creation time from which the database has to look for them.
+    """
+    with _lock:
+        members, watermark = _members, _watermark
+    if members is None:
+        return set(), [(list(addresses), None)]
+
+    found, missing = set(), []
+    for address in addresses:
+        if (key := _key(address)) is not None and key in members:
+            found.add(address)
+        else:
+            missing.append(address)
+    # the index holds every row up to its watermark, only newer rows can be missing from it
+    if isinstance(members, BloomFilter):
+        return set(), [(list(found), None), (missing, watermark)]
+    return found, [(missing, watermark)]
+
+def contains_many(addresses: Iterable[str], session: Session | None = None) -> set[str]:
+    """The given addresses that belong to our wallet."""
+    found, unsure = _lookup(addresses)
+    if any(group for group, _ in unsure):
+        if session is None:
+            with Session(engine) as session:
+                return found | _confirm(session, unsure)
+        return found | _confirm(session, unsure)
+    return found
+
+def _confirm(session: Session, unsure: list[tuple[list[str], datetime | None]]) -> set[str]:
+    found = set()
+    for addresses, since in unsure:
+        if addresses:
+            found |= crud.get_existing_addresses(session=session, addresses=addresses, since=since)
+    return found
+
+async def contains_many_async(addresses: Iterable[str], session: AsyncSession) -> set[str]:
+    found, unsure = _lookup(addresses)
+    for group, since in unsure:
+        if group:
+            found |= await async_crud.get_existing_addresses(session=session, addresses=group, since=since)
+    return found
+
+def contains(address: str, session: Session | None = None) -> bool:
+    return address in contains_many([address], session=session)
@@ -0,0 +1,48 @@
+import logging
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.service import address_index
+from app.utils import generate_eth_addresses
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Warm pool of derived addresses that were not handed out yet (assigned_at is
+# NULL). POST /address/allocate takes addresses from it with a single
+# UPDATE ... RETURNING. The worker refills it in bulk up to
+# ADDRESS_POOL_HIGH_WATERMARK once it falls under ADDRESS_POOL_LOW_WATERMARK;
+# allocations wake the refill through NOTIFY, and it also runs every
+# ADDRESS_POOL_INTERVAL_SECONDS.
+
+# pg advisory lock key, only one worker refills at a time
+REFILL_LOCK = 0x706F6F6C
+
+def refill() -> int:
+    """Tops the pool up when it is low and returns how many addresses were added."""
+    with engine.connect() as lock_connection:
+        if not lock_connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": REFILL_LOCK}).scalar_one():
+            return 0
+        try:
+            with Session(engine) as session:
+                available = crud.count_pool_addresses(session=session)
+                if available >= settings.ADDRESS_POOL_LOW_WATERMARK:
+                    return 0
+                reserved = crud.reserve_address_indexes(session=session, quantity=settings.ADDRESS_POOL_HIGH_WATERMARK - available)
+                indexes = crud.get_free_address_indexes(session=session, indexes=reserved)
+                # release the counter row right away; indexes of a refill cut short are left unused
+                session.commit()
+                for chunk in generate_eth_addresses(indexes):
+                    # each chunk can be handed out as soon as it is committed
+                    crud.bulk_insert_addresses(session=session, addresses=chunk, assigned=False)
+                    session.commit()
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REFILL_LOCK})
+
+    address_index.refresh()
+    logger.info("Address pool refilled with %s addresses, %s were left", len(indexes), available)
+    return len(indexes)
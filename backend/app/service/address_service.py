@@ -1,4 +1,5 @@
 from app import crud
+from app.service import address_index
 
 from sqlmodel import Session
 
@@ -8,11 +9,11 @@ from app.models import Address
 def create_address_job(session: Session, job_data):
     return crud.create_address_job(session=session, job_data=job_data)
 
-def get_addresses(session: Session):
-    return crud.get_addresses(session=session)
+def get_addresses(session: Session, after=None, limit: int = 100):
+    return crud.get_addresses(session=session, after=after, limit=limit)
 
 def check_address_exists(*, session: Session, address: str) -> bool:
-    return crud.check_address_exists(session=session, address=address)
+    return address_index.contains(address, session=session)
 
 def get_address(session: Session, address: str) -> Address:
     return crud.get_address(session=session, address=address)
\ No newline at end of file
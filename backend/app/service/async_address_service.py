@@ -0,0 +1,76 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import async_crud
+from app.api.models.models import (
+    AddressBalances, AddressBalancesResponse, AddressCreationStatus, AddressesResponse, AddressJobProgressResponse,
+)
+from app.core.db import ADDRESS_POOL_CHANNEL
+from app.integration import async_web3_integration
+from app.models import Address, AddressCreationJob, BalanceLedger
+from app.service import address_index
+from app.utils import decode_cursor, encode_cursor
+
+
+async def create_address_job(session: AsyncSession, job_data) -> AddressCreationJob:
+    return await async_crud.create_address_job(session=session, job_data=job_data)
+
+async def allocate_addresses(session: AsyncSession, quantity: int) -> list[Address] | None:
+    """Hands out quantity addresses from the pool, or None when it can't cover them."""
+    addresses = await async_crud.assign_pool_addresses(session=session, quantity=quantity)
+    if len(addresses) < quantity:
+        await session.rollback()
+        # the rolled back UPDATE notified nobody, wake the refill directly
+        await async_crud.notify(session=session, channel=ADDRESS_POOL_CHANNEL)
+        await session.commit()
+        return None
+    await session.commit()
+    return addresses
+
+async def get_address_job_progress(session: AsyncSession, job_id: uuid.UUID) -> AddressJobProgressResponse | None:
+    job = await async_crud.get_address_job(session=session, job_id=job_id)
+    if job is None:
+        return None
+
+    rate = remaining = None
+    if job.started_at is not None and job.generated_count:
+        elapsed = ((job.completed_at or datetime.now(timezone.utc)) - job.started_at).total_seconds()
+        rate = job.generated_count / elapsed if elapsed > 0 else None
+        if rate and job.status == AddressCreationStatus.PENDING:
+            remaining = (job.quantity - job.generated_count) / rate
+    return AddressJobProgressResponse(id=job.id, status=job.status, quantity=job.quantity,
+                                      generated_count=job.generated_count, progress=job.generated_count / job.quantity,
+                                      created_at=job.created_at, started_at=job.started_at,
+                                      completed_at=job.completed_at, addresses_per_second=rate,
+                                      estimated_seconds_remaining=remaining, attempts=job.attempts,
+                                      last_error=job.last_error, next_attempt_at=job.next_attempt_at)
+
+async def get_addresses(session: AsyncSession, cursor: str | None, limit: int, include_count: bool = False) -> AddressesResponse:
+    after = decode_cursor(cursor) if cursor else None
+    # one extra row tells whether there is a next page
+    addresses = await async_crud.get_addresses(session=session, after=after, limit=limit + 1)
+
+    next_cursor = None
+    if len(addresses) > limit:
+        addresses = addresses[:limit]
+        next_cursor = encode_cursor(addresses[-1].assigned_at, addresses[-1].id)
+
+    count = await async_crud.count_addresses(session=session) if include_count else None
+    return AddressesResponse(data=addresses, next_cursor=next_cursor, count=count)
+
+async def get_address_balances(session: AsyncSession, cursor: str | None, limit: int) -> AddressBalancesResponse:
+    page = await get_addresses(session=session, cursor=cursor, limit=limit)
+    # every balance of the page is read at the same block
+    block_number = await async_web3_integration.get_block_number()
+    balances = await async_web3_integration.get_balances([address.address for address in page.data], block_number)
+    return AddressBalancesResponse(block_number=block_number, next_cursor=page.next_cursor,
+                                   data=[AddressBalances(address=address.address, balances=balances[address.address])
+                                         for address in page.data])
+
+async def get_balance_ledger(session: AsyncSession, address: str) -> list[BalanceLedger]:
+    return await async_crud.get_balance_ledger(session=session, address=address)
+
+async def check_address_exists(*, session: AsyncSession, address: str) -> bool:
+    return address in await address_index.contains_many_async([address], session=session)
@@ -0,0 +1,145 @@
+import logging
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+
+from app.integration import async_web3_integration, token_transfers
+from app import async_crud
+
+from app.api.models.models import (
+    TransactionHistoryFilter, TransactionHistoryPageResponse, TransactionValidationResult, TransactionValidationStatus,
+)
+from app.crud import build_transaction_history_from_contract_tx, build_transaction_history_from_eth_tx
+from app.models import TransactionHistory
+from app.service import address_index, async_address_service
+from app.utils import decode_cursor, encode_cursor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def get_transactions_history_by_address(session: AsyncSession, address: str, cursor: str | None = None,
+                                              limit: int = 100, filters: TransactionHistoryFilter | None = None) -> TransactionHistoryPageResponse:
+    if not await async_address_service.check_address_exists(session=session, address=address):
+        raise ValueError("Address does not exist in the database.")
+
+    after = decode_cursor(cursor) if cursor else None
+    # one extra row tells whether there is a next page
+    history = await async_crud.get_transaction_history_by_address(session=session, address=address, after=after,
+                                                                  limit=limit + 1, filters=filters)
+    next_cursor = None
+    if len(history) > limit:
+        history = history[:limit]
+        next_cursor = encode_cursor(history[-1].created_at, history[-1].id)
+    return TransactionHistoryPageResponse(data=history, next_cursor=next_cursor)
+
+async def validate_transaction_hash(session: AsyncSession, transaction_hash: str):
+    confirmed = await async_web3_integration.get_confirmed_transaction(tx_hash=transaction_hash)
+    if confirmed is None:
+        raise Exception("Transaction is not valid.")
+
+    if await async_crud.check_transaction_history_exists(session=session, transaction_hash=transaction_hash):
+        logger.error("Transaction already exists in the database.")
+        raise Exception
+
+    tx, receipt = confirmed
+    address = tx['to']
+
+    if await async_web3_integration.is_contract_transaction(tx):
+        if not (transfers := token_transfers.decode_transfers(receipt['logs'])):
+            raise Exception("Transaction is not a transfer.")
+
+        # a transaction can carry several transfers (batch payouts, routers), keep the ones to our addresses
+        known = await address_index.contains_many_async([t.to_address for t in transfers], session=session)
+        if not (transfers := [t for t in transfers if t.to_address in known]):
+            raise Exception("Address does not exist in the database.")
+
+        await async_crud.create_transaction_history_from_token_transfers(session=session, transactions_hash=transaction_hash,
+                                                                         transaction_data=receipt, transfers=transfers)
+        return await async_crud.get_transaction_history_by_address(session=session, address=transfers[0].to_address)
+
+    # is a normal ether transaction
+    if await async_address_service.check_address_exists(session=session, address=address):
+        await async_crud.create_transaction_history_from_eth_tx(session=session, transactions_hash=transaction_hash, transaction_data=tx, transaction_receipt=receipt)
+        return await async_crud.get_transaction_history_by_address(session=session, address=address)
+    else:
+        raise Exception("Address does not exist in the database.")
+
+
+def _invalid(transaction_hash: str, detail: str) -> TransactionValidationResult:
+    return TransactionValidationResult(transaction_hash=transaction_hash, status=TransactionValidationStatus.INVALID, detail=detail)
+
+async def validate_transaction_hashes(session: AsyncSession, transaction_hashes: list[str]) -> list[TransactionValidationResult]:
+    """
+    Batch counterpart of validate_transaction_hash: one existence query, batched
+    RPC lookups and one bulk insert for the whole batch. Returns a result per
+    hash, in request order, so a bad hash doesn't fail the others.
+    """
+    hashes = list(dict.fromkeys(transaction_hashes))
+    results: dict[str, TransactionValidationResult] = {}
+
+    existing = await async_crud.get_existing_transaction_hashes(session=session, transaction_hashes=hashes)
+    for tx_hash in existing:
+        results[tx_hash] = TransactionValidationResult(transaction_hash=tx_hash, status=TransactionValidationStatus.ALREADY_EXISTS,
+                                                       detail="Transaction already exists in the database.")
+    pending = [tx_hash for tx_hash in hashes if tx_hash not in existing]
+
+    # receipts first, transactions are only needed for the confirmed ones
+    head = await async_web3_integration.get_block_number()
+    receipts = await async_web3_integration.get_transaction_receipts(pending) if pending else {}
+    confirmed = []
+    for tx_hash in pending:
+        receipt = receipts[tx_hash]
+        if receipt is None or receipt.get("status") != 1 or head - receipt["blockNumber"] < settings.CONFIRMATIONS_REQUIRED:
+            results[tx_hash] = _invalid(tx_hash, "Transaction is not valid.")
+        else:
+            confirmed.append(tx_hash)
+
+    txs = await async_web3_integration.get_transactions(confirmed) if confirmed else {}
+    calls = {txs[tx_hash]["to"] for tx_hash in confirmed if txs[tx_hash] is not None and txs[tx_hash]["input"] != "0x"}
+    codes = await async_web3_integration.get_codes(list(calls)) if calls else {}
+
+    candidates: list[tuple[str, TransactionHistory]] = []
+    for tx_hash in confirmed:
+        tx, receipt = txs[tx_hash], receipts[tx_hash]
+        if tx is None or tx["to"] is None:
+            results[tx_hash] = _invalid(tx_hash, "Transaction is not valid.")
+            continue
+
+        if tx["input"] == "0x" or not codes.get(tx["to"]):
+            # is a normal ether transaction
+            history = build_transaction_history_from_eth_tx(transactions_hash=tx_hash, transaction_data=tx, transaction_receipt=receipt)
+            candidates.append((tx_hash, history))
+            continue
+
+        if not (transfers := token_transfers.decode_transfers(receipt["logs"])):
+            results[tx_hash] = _invalid(tx_hash, "Transaction is not a transfer.")
+            continue
+
+        for transfer in transfers:
+            history = build_transaction_history_from_contract_tx(transactions_hash=tx_hash, transaction_data=receipt, address=transfer.to_address,
+                                                                 amount=transfer.amount, asset=transfer.asset, log_index=transfer.log_index)
+            candidates.append((tx_hash, history))
+
+    recipients = list({history.to_address for _, history in candidates})
+    known = await address_index.contains_many_async(recipients, session=session)
+    new_history = [history for _, history in candidates if history.to_address in known]
+    recorded = {history.transaction_hash for history in new_history}
+    for tx_hash, _ in candidates:
+        if tx_hash not in recorded:
+            results[tx_hash] = _invalid(tx_hash, "Address does not exist in the database.")
+
+    inserted: dict[str, list[TransactionHistory]] = {}
+    for history in await async_crud.bulk_create_transaction_history(session=session, transaction_history=new_history):
+        inserted.setdefault(history.transaction_hash, []).append(history)
+    for tx_hash in recorded:
+        if tx_hash in inserted:
+            results[tx_hash] = TransactionValidationResult(transaction_hash=tx_hash, status=TransactionValidationStatus.CREATED,
+                                                           data=inserted[tx_hash])
+        else:
+            # stored by a concurrent request after the existence check
+            results[tx_hash] = TransactionValidationResult(transaction_hash=tx_hash, status=TransactionValidationStatus.ALREADY_EXISTS,
+                                                           detail="Transaction already exists in the database.")
+
+    logger.info("Validated %s transactions, %s stored", len(hashes), len(inserted))
+    return [results[tx_hash] for tx_hash in transaction_hashes]
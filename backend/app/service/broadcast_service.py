@@ -0,0 +1,137 @@
+import logging
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session
+
+from app import crud
+from app.api.models.models import TransactionStatus
+from app.core.config import settings
+from app.core.db import engine
+from app.integration import fee_oracle, web3_integration
+from app.models import Transaction
+from app.service import gas_funding_service, lease_service, nonce_service
+from app.utils import get_private_key_from_index
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Broadcast stage of the PENDING token transfers. Senders are processed
+# concurrently, the transactions of one sender in order so their nonces are
+# too. Each transaction is committed as soon as it is broadcast; one that fails
+# is parked as RETRYING with an exponential backoff, and FAILED after
+# BROADCAST_MAX_ATTEMPTS, without holding up the others. Only the transactions
+# this worker holds the lease on are sent, each under a row lock, so another
+# worker can't claim it mid-broadcast. Only the transactions the node surely
+# did not take are retried: once signed, a transaction is recorded as STARTED
+# with its hash before it is sent, and a send that may have reached the node
+# is left for check_transaction_finalization to resolve.
+
+def broadcast(session: Session, t: Transaction, private_key: str) -> None:
+    token = settings.token_by_symbol.get(t.asset)
+    token_contract = token.get("contract")
+    decimals = token.get("decimals")
+    value = int(t.amount * (10 ** decimals))
+
+    balance = web3_integration.get_eth_balance(t.from_address)
+    fees = fee_oracle.get_fees()
+    # the gas limit the sender was funded for, estimated when the transfer was created
+    gas = gas_funding_service.gas_limit(t)
+    fee_fields = fees.fee_fields()
+    cost = gas * fees.max_gas_price
+    if cost > balance and fees.eip1559 and balance // gas >= fees.base_fee + fees.priority_fee:
+        # the top-up was priced at the fees of its own run; the max fee is only a
+        # cap, so one the balance covers still gets the transfer in at the current base fee
+        fee_fields["maxFeePerGas"] = balance // gas
+        cost = gas * fee_fields["maxFeePerGas"]
+
+    new_tx = token_contract.functions.transfer(t.to_address, value).build_transaction({
+        'from': t.from_address,
+        'chainId': int(settings.CHAIN_ID),
+        'gas': gas,
+        **fee_fields,
+    })
+
+    logger.info("Transaction cost: %s, Balance: %s from wallet %s", cost, balance, t.from_address)
+    if cost > balance:
+        raise ValueError(
+            "Insufficient funds for transaction. Please ensure you have enough ETH to cover the transfer and gas fees.")
+
+    unknown_outcome = None
+    with nonce_service.reserve_nonce(t.from_address) as nonce:
+        new_tx["nonce"] = nonce
+        tx_hash, raw_transaction = web3_integration.sign_transaction(new_tx, private_key)
+        # committed before the send: from here on the node may have the transaction,
+        # so the transfer is never signed again under another nonce
+        t.transaction_hash = tx_hash
+        t.status = TransactionStatus.STARTED
+        t.next_attempt_at = None
+        session.add(t)
+        session.commit()
+        try:
+            web3_integration.send_raw_transaction(raw_transaction)
+        except Exception as e:
+            if web3_integration.is_rejected_send(e):
+                raise e
+            unknown_outcome = e
+
+    if unknown_outcome is not None:
+        # left STARTED, check_transaction_finalization tells whether it made it on chain
+        logger.warning("Broadcast of transaction %s as %s has an unknown outcome: %s", t.id, tx_hash, unknown_outcome)
+        if nonce_service.is_nonce_error(unknown_outcome):
+            nonce_service.resync_nonce(t.from_address)
+
+def park(session: Session, t: Transaction, error: Exception) -> None:
+    """Parks a transaction that was not sent, for a retry or as FAILED."""
+    session.rollback()
+    t.transaction_hash = None
+    t.attempts += 1
+    t.last_error = str(error)[:500]
+    if t.attempts >= settings.BROADCAST_MAX_ATTEMPTS:
+        t.status = TransactionStatus.FAILED
+        t.next_attempt_at = None
+        logger.error("Giving up on transaction %s after %s attempts: %s", t.id, t.attempts, error)
+    else:
+        delay = min(settings.BROADCAST_RETRY_MAX_SECONDS, settings.BROADCAST_RETRY_BASE_SECONDS * 2 ** (t.attempts - 1))
+        t.status = TransactionStatus.RETRYING
+        t.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        logger.warning("Broadcast of transaction %s failed, retrying in %ss: %s", t.id, delay, error)
+    session.add(t)
+    session.commit()
+
+def broadcast_sender(from_address: str, transaction_ids: list[uuid.UUID]) -> int:
+    """Broadcasts the transactions of one sender in order and returns how many were sent."""
+    sent = 0
+    with Session(engine) as session:
+        address = crud.get_address(session=session, address=from_address)
+        private_key = get_private_key_from_index(address.index) if address else None
+        for transaction_id in transaction_ids:
+            t = session.get(Transaction, transaction_id, with_for_update=True)
+            if t.claimed_by != lease_service.worker_id() or t.status not in (TransactionStatus.PENDING, TransactionStatus.RETRYING):
+                # the lease expired and the transaction was claimed elsewhere
+                session.rollback()
+                continue
+            try:
+                if private_key is None:
+                    raise ValueError(f"Address {from_address} does not exist in the database.")
+                broadcast(session, t, private_key)
+                sent += 1
+            except Exception as e:
+                park(session, t, e)
+    return sent
+
+def broadcast_pending(claimed: list[Transaction], skip: set[str] = frozenset()) -> int:
+    """Broadcasts the claimed transactions, except the ones from the senders in skip."""
+    transactions = [t for t in claimed if t.from_address not in skip]
+    by_sender: dict[str, list[uuid.UUID]] = defaultdict(list)
+    for t in transactions:
+        by_sender[t.from_address].append(t.id)
+    if not by_sender:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=settings.BROADCAST_WORKERS, thread_name_prefix="broadcast") as executor:
+        sent = sum(executor.map(broadcast_sender, by_sender.keys(), by_sender.values()))
+    logger.info("Broadcast %s of %s transactions from %s senders", sent, len(transactions), len(by_sender))
+    return sent
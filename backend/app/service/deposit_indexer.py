@@ -0,0 +1,139 @@
+import logging
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.integration import token_transfers, web3_integration
+from app.service import address_index
+from app.models import TransactionHistory
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Follows the chain INDEXER_CONFIRMATIONS blocks behind the head and records
+# deposits to our addresses: token Transfer logs through eth_getLogs over block
+# ranges, and plain ETH transfers from the block bodies. The last indexed block
+# is persisted with the rows it produced, so a restart resumes where it stopped.
+# Every worker schedules it, one at a time runs it.
+# Point INFURA_ENDPOINT at a local dev chain and set INDEXER_CONFIRMATIONS=0 and
+# INDEXER_START_BLOCK to exercise it end to end.
+
+CHECKPOINT = "deposits"
+# pg advisory lock key, only one worker indexes at a time
+INDEXER_LOCK = 0x696E6478
+
+_range_size = settings.INDEXER_INITIAL_RANGE
+
+def _resize(logs: int, limit: int) -> None:
+    global _range_size
+    if logs > settings.INDEXER_TARGET_LOGS:
+        _range_size = max(1, _range_size // 2)
+    elif logs < settings.INDEXER_TARGET_LOGS // 2:
+        _range_size = min(limit, _range_size * 2)
+
+def get_transfer_logs(from_block: int, to_block: int) -> list:
+    addresses = [token["address"] for token in settings.token_by_symbol.values()]
+    return web3_integration.get_logs(from_block, to_block, addresses, [token_transfers.TRANSFER_TOPIC])
+
+def get_eth_transfers(from_block: int, to_block: int) -> list:
+    blocks = web3_integration.get_blocks(list(range(from_block, to_block + 1)))
+    if any(block is None for block in blocks.values()):
+        raise ValueError(f"Missing blocks in range {from_block}-{to_block}")
+    return [tx for block in blocks.values() for tx in block["transactions"] if tx["value"] > 0 and tx["to"] is not None]
+
+def scan_range(session: Session, from_block: int, to_block: int) -> tuple[list[TransactionHistory], int]:
+    """
+    History rows for the deposits to our addresses mined between from_block and
+    to_block, and the number of token transfers scanned.
+    """
+    transfers = [(log["transactionHash"].to_0x_hex(), transfer)
+                 for log in get_transfer_logs(from_block, to_block)
+                 for transfer in token_transfers.decode_transfers([log])]
+    scanned = len(transfers)
+    eth_transfers = get_eth_transfers(from_block, to_block) if settings.INDEXER_ETH_DEPOSITS else []
+
+    recipients = {transfer.to_address for _, transfer in transfers} | {tx["to"] for tx in eth_transfers}
+    known = address_index.contains_many(recipients, session=session)
+    transfers = [(tx_hash, transfer) for tx_hash, transfer in transfers if transfer.to_address in known]
+    eth_transfers = [tx for tx in eth_transfers if tx["to"] in known]
+
+    # transfers we sent ourselves are recorded by check_transaction_finalization
+    tx_hashes = list({tx_hash for tx_hash, _ in transfers} | {tx["hash"].to_0x_hex() for tx in eth_transfers})
+    if not tx_hashes:
+        return [], scanned
+    sent = crud.get_sent_transaction_hashes(session=session, transaction_hashes=tx_hashes)
+    receipts = web3_integration.get_transaction_receipts([tx_hash for tx_hash in tx_hashes if tx_hash not in sent])
+
+    history = []
+    for tx_hash, transfer in transfers:
+        if (receipt := receipts.get(tx_hash)) is not None:
+            history.append(crud.build_transaction_history_from_contract_tx(transactions_hash=tx_hash, transaction_data=receipt,
+                                                                           address=transfer.to_address, amount=transfer.amount,
+                                                                           asset=transfer.asset, log_index=transfer.log_index))
+    for tx in eth_transfers:
+        tx_hash = tx["hash"].to_0x_hex()
+        if (receipt := receipts.get(tx_hash)) is not None and receipt["status"] == 1:
+            history.append(crud.build_transaction_history_from_eth_tx(transactions_hash=tx_hash, transaction_data=tx,
+                                                                      transaction_receipt=receipt))
+    return history, scanned
+
+def index_range(from_block: int, to_block: int) -> tuple[int, int]:
+    """
+    Records the deposits of the range and moves the checkpoint in the same
+    database transaction. Returns the deposits recorded and transfers scanned.
+    """
+    with Session(engine) as session:
+        history, scanned = scan_range(session, from_block, to_block)
+        inserted = crud.bulk_create_transaction_history(session=session, transaction_history=history)
+        crud.set_indexer_checkpoint(session=session, name=CHECKPOINT, block_number=to_block)
+        session.commit()
+    return inserted, scanned
+
+def run(to_block: int | None = None) -> int:
+    """
+    Indexes from the checkpoint up to to_block, or the safe head, and returns
+    the deposits recorded; nothing when another worker is indexing.
+    """
+    with engine.connect() as lock_connection:
+        if not lock_connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": INDEXER_LOCK}).scalar_one():
+            return 0
+        try:
+            return _index_up_to(to_block)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INDEXER_LOCK})
+
+def _index_up_to(to_block: int | None) -> int:
+    global _range_size
+    if to_block is None:
+        to_block = web3_integration.get_block_number() - settings.INDEXER_CONFIRMATIONS
+
+    with Session(engine) as session:
+        last_block = crud.get_indexer_checkpoint(session=session, name=CHECKPOINT)
+    if last_block is None:
+        start = settings.INDEXER_START_BLOCK if settings.INDEXER_START_BLOCK is not None else to_block
+        last_block = start - 1
+
+    inserted = 0
+    # ranges the node refused are not tried again during this run
+    limit = settings.INDEXER_MAX_RANGE
+    while last_block < to_block:
+        from_block = last_block + 1
+        end = min(to_block, from_block + _range_size - 1)
+        try:
+            recorded, scanned = index_range(from_block, end)
+        except Exception as e:
+            if _range_size == 1:
+                raise e
+            # too many results or a timeout, retry with a smaller range
+            _range_size = limit = max(1, (end - from_block + 1) // 2)
+            logger.warning("Indexing blocks %s-%s failed, range reduced to %s: %s", from_block, end, _range_size, e)
+            continue
+        inserted += recorded
+        _resize(scanned, limit)
+        last_block = end
+
+    logger.info("Indexed up to block %s: %s deposits recorded, range %s", to_block, inserted, _range_size)
+    return inserted
@@ -0,0 +1,129 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from sqlmodel import Session
+from web3 import Web3
+
+from app import crud
+from app.api.models.models import TransactionStatus
+from app.core.config import settings
+from app.core.db import engine
+from app.integration import fee_oracle, web3_integration
+from app.models import Transaction
+from app.service import nonce_service
+from app.utils import get_main_address, get_private_key_from_master
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Funds the gas of pending token transfers from the master wallet. The needs of
+# the transfers this worker claimed are added up per sender and checked
+# against its ETH balance, so a sender gets at most one top-up per run and none
+# when it already holds enough. Senders with a top-up still on its way are left
+# until it is mined. Top-ups are sent back to back from the master account with
+# consecutive nonces.
+
+ETH_TRANSFER_GAS = 21_000
+
+_lock = threading.Lock()
+_stats = {"token_transactions": 0, "topups_sent": 0}
+# transfers created up to here were already counted in _stats
+_counted_until: datetime | None = None
+
+def funding_stats() -> dict[str, int]:
+    """Token transfers seen so far, top-ups sent for them and top-ups avoided compared to one per transfer."""
+    with _lock:
+        return {**_stats, "topups_avoided": _stats["token_transactions"] - _stats["topups_sent"]}
+
+def gas_limit(t: Transaction) -> int:
+    """Gas limit of a token transfer, the one it is funded for and broadcast with."""
+    return t.gas_limit or fee_oracle.apply_gas_buffer(settings.ERC20_TRANSFER_GAS_FALLBACK)
+
+def gas_needed(t: Transaction, max_gas_price: int) -> int:
+    return gas_limit(t) * max_gas_price
+
+def send_topups(topups: dict[str, int], fees: fee_oracle.FeeSnapshot) -> list[Transaction]:
+    """Sends the top-ups in one burst from the master account and returns the ones sent."""
+    master = get_main_address()
+    private_key = get_private_key_from_master(0)
+    sent = []
+    try:
+        with nonce_service.reserve_nonces(master) as burst:
+            for address, amount_wei in topups.items():
+                new_tx = {
+                    'to': address,
+                    'value': amount_wei,
+                    'gas': ETH_TRANSFER_GAS,
+                    'chainId': int(settings.CHAIN_ID),
+                    **fees.fee_fields(),
+                }
+                unknown_outcome = None
+                with burst.reserve() as nonce:
+                    new_tx["nonce"] = nonce
+                    tx_hash, raw_transaction = web3_integration.sign_transaction(new_tx, private_key)
+                    try:
+                        web3_integration.send_raw_transaction(raw_transaction)
+                    except Exception as e:
+                        if web3_integration.is_rejected_send(e):
+                            raise e
+                        unknown_outcome = e
+                # recorded also when the node may have it, a top-up sent twice is worse than a late one
+                sent.append(Transaction(from_address=master, to_address=address, asset="ETH",
+                                        amount=Web3.from_wei(amount_wei, "ether"), transaction_hash=tx_hash,
+                                        status=TransactionStatus.STARTED))
+                if unknown_outcome is not None:
+                    raise unknown_outcome
+    except Exception as e:
+        # the rest of the burst would leave a nonce gap, it goes in the next run
+        logger.error("Gas top-up burst stopped after %s of %s transactions: %s", len(sent), len(topups), e)
+    return sent
+
+def fund_pending(claimed: list[Transaction]) -> set[str]:
+    """
+    Tops up the senders of the claimed token transfers that can't pay for their
+    gas. Returns the senders still waiting for a top-up to be mined, which the
+    broadcast stage skips.
+    """
+    global _counted_until
+    master = get_main_address()
+    transactions = [t for t in claimed if t.asset != "ETH"]
+    with Session(engine) as session:
+        inflight = crud.get_inflight_funding(session=session, funder=master)
+    if not transactions:
+        return set(inflight)
+
+    fees = fee_oracle.get_fees()
+    needs: dict[str, int] = defaultdict(int)
+    for t in transactions:
+        # senders with a top-up on its way are funded again once it is mined
+        if t.from_address not in inflight:
+            needs[t.from_address] += gas_needed(t, fees.max_gas_price)
+
+    balances = web3_integration.get_eth_balances(list(needs)) if needs else {}
+    topups: dict[str, int] = {}
+    awaiting = set(inflight)
+    for address, need in needs.items():
+        if (balance := balances.get(address)) is None:
+            awaiting.add(address)
+        elif need > balance:
+            topups[address] = need - balance
+            awaiting.add(address)
+
+    sent = send_topups(topups, fees) if topups else []
+    if sent:
+        with Session(engine) as session:
+            crud.bulk_create_transactions(session=session, transactions=sent)
+
+    with _lock:
+        new = [t for t in transactions if _counted_until is None or t.created_at > _counted_until]
+        _stats["token_transactions"] += len(new)
+        _stats["topups_sent"] += len(sent)
+        if new:
+            _counted_until = max(t.created_at for t in new)
+    stats = funding_stats()
+    logger.info("Gas funding: %s senders checked, %s top-ups sent, %s new token transfers "
+                "(since start: %s token transfers, %s top-ups sent, %s avoided)",
+                len(needs), len(sent), len(new), stats["token_transactions"], stats["topups_sent"], stats["topups_avoided"])
+    return awaiting
@@ -0,0 +1,52 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Any number of worker processes can run the scheduler jobs against the same
+# database. The rows of the work queues (address jobs, PENDING and RETRYING
+# transfers to broadcast, STARTED ones waiting for inclusion) are claimed with
+# a lease of LEASE_SECONDS that is committed right away, so no lock is held
+# while the work runs. While a worker works on its rows a heartbeat keeps
+# extending their leases; the rows of a worker that died become claimable
+# again once their leases expire.
+
+def worker_id() -> str:
+    # computed on each call, forked processes get their own
+    return f"{settings.WORKER_ID or socket.gethostname()}-{os.getpid()}"
+
+def _beat(model: crud.LeasedModel, ids: list[uuid.UUID], stop: threading.Event) -> None:
+    while not stop.wait(settings.LEASE_SECONDS / 3):
+        try:
+            with Session(engine) as session:
+                crud.extend_leases(session=session, model=model, ids=ids, worker_id=worker_id())
+                session.commit()
+        except Exception as e:
+            logger.warning("Error extending the leases of %s %s rows: %s", len(ids), model.__name__, e)
+
+@contextmanager
+def heartbeat(model: crud.LeasedModel, ids: list[uuid.UUID]) -> Iterator[None]:
+    """Keeps the leases on the given rows while the block runs and releases the ones still held on exit."""
+    stop = threading.Event()
+    beater = threading.Thread(target=_beat, args=(model, ids, stop), name=f"heartbeat-{model.__name__}", daemon=True)
+    beater.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        beater.join()
+        with Session(engine) as session:
+            crud.release_leases(session=session, model=model, ids=ids, worker_id=worker_id())
+            session.commit()
@@ -0,0 +1,48 @@
+import logging
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Consistency check of the BalanceLedger, which a trigger keeps up to date on
+# every TransactionHistory insert. The ledger is compared with the one computed
+# from the whole history and rebuilt from it when they differ, e.g. after
+# history rows were changed or removed by hand. Every worker schedules it, one
+# at a time runs it.
+
+# pg advisory lock key, only one worker checks the ledger at a time
+LEDGER_CHECK_LOCK = 0x6C656467
+
+def check_ledger(repair: bool = True) -> int:
+    """
+    Returns the ledger rows that did not match the history, rebuilding the
+    ledger if any and repair is set; 0 when another worker is checking it.
+    """
+    with engine.connect() as lock_connection:
+        if not lock_connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEDGER_CHECK_LOCK}).scalar_one():
+            return 0
+        try:
+            return _check_ledger(repair)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LEDGER_CHECK_LOCK})
+
+def _check_ledger(repair: bool) -> int:
+    with Session(engine) as session:
+        mismatches = crud.count_ledger_mismatches(session=session)
+        if not mismatches:
+            logger.info("Balance ledger matches the transaction history")
+            return 0
+
+        logger.warning("Balance ledger has %s rows out of step with the transaction history", mismatches)
+        if repair:
+            # the check is one statement, so it compares history and ledger in a
+            # single snapshot: a mismatch is real, never a history insert in flight
+            rows = crud.rebuild_balance_ledger(session=session)
+            session.commit()
+            logger.info("Balance ledger rebuilt with %s rows", rows)
+    return mismatches
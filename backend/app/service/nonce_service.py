@@ -0,0 +1,85 @@
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.integration import web3_integration
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# node errors meaning our local nonce no longer matches the chain
+NONCE_ERRORS = ("nonce too low", "nonce too high", "already known", "replacement transaction underpriced")
+
+def is_nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(e in message for e in NONCE_ERRORS)
+
+class NonceBurst:
+    """Consecutive nonces of an address, handed out while its row lock is held."""
+
+    def __init__(self, next_nonce: int) -> None:
+        self.next_nonce = next_nonce
+
+    @contextmanager
+    def reserve(self) -> Iterator[int]:
+        # consumed only when the block exits cleanly, a failed send leaves no gap
+        yield self.next_nonce
+        self.next_nonce += 1
+
+@contextmanager
+def reserve_nonces(address: str) -> Iterator[NonceBurst]:
+    """
+    Holds the row lock of address for a burst of sends that don't wait for each
+    other to be mined. The nonces reserved through the burst are stored on exit,
+    also when a later send of the burst failed.
+    """
+    with Session(engine) as session:
+        nonce_row = crud.lock_address_nonce(session=session, address=address)
+        if nonce_row is None:
+            chain_nonce = web3_integration.get_address_nonce(address, "pending")
+            crud.create_address_nonce(session=session, address=address, next_nonce=chain_nonce)
+            nonce_row = crud.lock_address_nonce(session=session, address=address)
+
+        burst = NonceBurst(nonce_row.next_nonce)
+        try:
+            yield burst
+        except Exception as e:
+            nonce_row.next_nonce = burst.next_nonce
+            session.add(nonce_row)
+            session.commit()
+            if is_nonce_error(e):
+                resync_nonce(address)
+            raise e
+
+        nonce_row.next_nonce = burst.next_nonce
+        session.add(nonce_row)
+        session.commit()
+
+@contextmanager
+def reserve_nonce(address: str) -> Iterator[int]:
+    """
+    Yields the next nonce of address while holding its row lock, so concurrent
+    sends from the same address (in any process) are serialized. The nonce is
+    only consumed when the block exits cleanly, a failed send leaves no gap.
+    """
+    with reserve_nonces(address) as burst:
+        with burst.reserve() as nonce:
+            yield nonce
+
+def resync_nonce(address: str) -> int:
+    """Resets the local nonce of address to the chain's pending transaction count."""
+    with Session(engine) as session:
+        chain_nonce = web3_integration.get_address_nonce(address, "pending")
+        nonce_row = crud.lock_address_nonce(session=session, address=address)
+        if nonce_row is None:
+            crud.create_address_nonce(session=session, address=address, next_nonce=chain_nonce)
+        else:
+            logger.info("Resyncing nonce of %s from %s to %s", address, nonce_row.next_nonce, chain_nonce)
+            nonce_row.next_nonce = chain_nonce
+            session.add(nonce_row)
+        session.commit()
+        return chain_nonce
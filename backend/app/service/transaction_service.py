@@ -1,16 +1,16 @@
 import logging
 
-from app.service import address_service
+from app.service import address_index, address_service, nonce_service
 from sqlmodel import Session
 
 from app.core.config import settings
 
-from app.integration import web3_integration
+from app.integration import fee_oracle, token_transfers, web3_integration
 from app import crud
 
 from app.api.models.models import CreateTransactionRequest, TransactionStatus
 from app.models import Transaction
-from app.utils import get_private_key_from_index, get_main_address, get_private_key_from_master
+from app.utils import get_private_key_from_index, get_private_key_from_master
 
 from decimal import Decimal
 
@@ -41,32 +41,16 @@ def validate_transaction_hash(session: Session, transaction_hash: str):
         is_contract_transaction = web3_integration.is_contract_transaction(tx_hash=transaction_hash)
 
         if is_contract_transaction:
-            if (token_contract := settings.token_by_contract_address.get(address)) is None:
-                logger.error("Token contract not found in settings.")
-                raise Exception
-
-            for log in receipt['logs']:
-                print("LOG: ", log)
-                if log['address'].lower() == token_contract.get("address").lower():
-                    # This is a token transfer
-                    contract = token_contract.get("contract")
-                    event = contract.events.Transfer().process_log(log)
-                    asset = token_contract.get("symbol")
-                    decimals = token_contract.get("decimals")
-                    address = event["args"]["to"]
-                    amount = int(event["args"]["value"])
-
-                    quantizer = Decimal("1." + "0" * decimals)
-                    amount = Decimal(amount) / Decimal(10 ** decimals)
-                    amount.quantize(quantizer)
-
-                    if address_service.check_address_exists(session=session, address=address):
-                        crud.create_transaction_history_from_contract_tx(session=session, transactions_hash=transaction_hash, transaction_data=receipt, address=address, amount=amount, asset=asset)
-                        return crud.get_transaction_history_by_address(session=session, address=address)
-                    else:
-                        raise Exception("Address does not exist in the database.")
-
-            raise Exception("Transaction is not a transfer.")
+            if not (transfers := token_transfers.decode_transfers(receipt['logs'])):
+                raise Exception("Transaction is not a transfer.")
+
+            # a transaction can carry several transfers (batch payouts, routers), keep the ones to our addresses
+            known = address_index.contains_many([t.to_address for t in transfers], session=session)
+            if not (transfers := [t for t in transfers if t.to_address in known]):
+                raise Exception("Address does not exist in the database.")
+
+            crud.create_transaction_history_from_token_transfers(session=session, transactions_hash=transaction_hash, transaction_data=receipt, transfers=transfers)
+            return crud.get_transaction_history_by_address(session=session, address=transfers[0].to_address)
 
         # is a normal ether transaction
         if address_service.check_address_exists(session=session, address=address):
@@ -99,37 +83,43 @@ def create_eth_transaction(session: Session, from_address: str, to_address: str,
         raise ValueError(f"Address {from_address} does not exist in the database.")
 
     amount_wei = web3.to_wei(amount, 'ether')
-    nonce = web3_integration.get_address_nonce(from_address)
+    eth_fund = web3_integration.get_eth_balance(from_address)
+    fees = fee_oracle.get_fees()
 
     new_tx = {
         'to': to_address,
         'value': amount_wei,
-        'nonce': nonce,
         'chainId': int(settings.CHAIN_ID)
     }
 
     estimated_gas = web3_integration.get_transaction_estimate(new_tx)
-    gas_with_buffer = int(estimated_gas * 1.2)
+    gas_with_buffer = fee_oracle.apply_gas_buffer(estimated_gas)
 
-    gas_price = web3.eth.gas_price
     new_tx["gas"] = gas_with_buffer
-    new_tx["gasPrice"] = gas_price
-
-    cost = gas_with_buffer * gas_price
+    new_tx.update(fees.fee_fields())
 
-    logger.info("Estimated gas: %s, Gas with buffer: %s, Gas price: %s, Cost: %s", estimated_gas, gas_with_buffer, gas_price, cost)
+    cost = gas_with_buffer * fees.max_gas_price
 
-    eth_fund = web3_integration.get_eth_balance(address.address)
+    logger.info("Estimated gas: %s, Gas with buffer: %s, Gas price: %s, Cost: %s", estimated_gas, gas_with_buffer, fees.max_gas_price, cost)
 
     logger.info("ETH balance for address %s: %s", from_address, eth_fund)
     if cost + amount_wei > eth_fund:
         raise ValueError("Insufficient funds for transaction. Please ensure you have enough ETH to cover the transfer and gas fees.")
 
-    logger.info("signing and sending transaction: %s", new_tx)
-
     logger.info("Address %s has index %s", from_address, address.index)
     pk = get_private_key_from_master(address.index) if is_master else get_private_key_from_index(address.index)
-    new_tx_hash = web3_integration.sign_and_send_transaction(transaction=new_tx, private_key=pk)
+
+    with nonce_service.reserve_nonce(from_address) as nonce:
+        new_tx["nonce"] = nonce
+        logger.info("signing and sending transaction: %s", new_tx)
+        new_tx_hash, raw_transaction = web3_integration.sign_transaction(new_tx, pk)
+        try:
+            web3_integration.send_raw_transaction(raw_transaction)
+        except Exception as e:
+            if web3_integration.is_rejected_send(e):
+                raise e
+            # the node may have it, recorded as STARTED for check_transaction_finalization to resolve
+            logger.warning("Send of transaction %s has an unknown outcome: %s", new_tx_hash, e)
 
     logger.info("Transaction sent with hash: %s", new_tx_hash)
 
@@ -156,29 +146,25 @@ def create_contract_transaction(session: Session, from_address: str, to_address:
         raise ValueError(
             "Insufficient token balance for transaction. Please ensure you have enough tokens to cover the transfer.")
 
-    nonce = web3_integration.get_address_nonce(from_address)
+    fees = fee_oracle.get_fees()
 
+    # only built to estimate gas, the nonce is reserved when the scheduler sends it
     new_tx = token_contract.functions.transfer(to_address, value).build_transaction({
         'from': from_address,
-        'nonce': nonce,
-        'chainId': int(settings.CHAIN_ID)
+        'chainId': int(settings.CHAIN_ID),
+        'gas': settings.ERC20_TRANSFER_GAS_FALLBACK,
+        **fees.fee_fields(),
     })
 
     estimated_gas = web3_integration.get_transaction_estimate(new_tx)
 
     # sometimes it start giving errors, with if the contract working fine
     if estimated_gas == 0:
-        estimated_gas = 65000 # enough for most ERC20 transfers
-
-    gas_with_buffer = int(estimated_gas * 1.2)
+        estimated_gas = settings.ERC20_TRANSFER_GAS_FALLBACK
 
-    gas_price = web3.eth.gas_price
+    gas_with_buffer = fee_oracle.apply_gas_buffer(estimated_gas)
 
+    # the sender's gas is topped up by gas_funding_service before the broadcast, if needed
     tx = Transaction(from_address=from_address, to_address=to_address,
-                     asset=asset, amount=amount, status=TransactionStatus.PENDING)
-    main_tx = crud.create_transaction(session=session, transaction_data=tx)
-
-    cost_eth = gas_with_buffer * gas_price
-    create_eth_transaction(session=session, from_address=get_main_address(), to_address=from_address, amount=web3.from_wei(cost_eth, 'ether'), is_master=True)
-
-    return main_tx
\ No newline at end of file
+                     asset=asset, amount=amount, gas_limit=gas_with_buffer, status=TransactionStatus.PENDING)
+    return crud.create_transaction(session=session, transaction_data=tx)
\ No newline at end of file
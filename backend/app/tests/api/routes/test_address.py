@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.main import app
+from app.models import Address
+from app.tests.utils.rpc import RPCServer
+from app.tests.utils.utils import random_address
+from app.utils import get_main_address
+
+
+def test_pool_addresses_are_not_listed(db: Session, rpc: RPCServer) -> None:
+    now = datetime.now(timezone.utc)
+    # handed out in the reverse order of their creation, and one still in the pool
+    assigned = [random_address() for _ in range(3)]
+    db.add_all([Address(address=address, index=4_000_000 + i, assigned_at=now + timedelta(seconds=3 - i))
+                for i, address in enumerate(assigned)])
+    db.add(Address(address=random_address(), index=4_000_010))
+    db.commit()
+    rpc.handlers.update({
+        "eth_blockNumber": lambda: "0x64",
+        "eth_getBalance": lambda address, block: "0x0",
+        "eth_call": lambda call, block: "0x",
+    })
+
+    listed, balances, cursor = [], [], None
+    with TestClient(app) as client:
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = client.get(f"{settings.API_V1_STR}/address", params=params).json()["data"]
+            listed += [address["address"] for address in page["data"]]
+            balances += [a["address"] for a in client.get(f"{settings.API_V1_STR}/address/balances", params=params).json()["data"]["data"]]
+            if not (cursor := page["next_cursor"]):
+                break
+
+    assert listed == balances == [get_main_address(), *reversed(assigned)]
@@ -0,0 +1,39 @@
+import os
+from collections.abc import Generator
+
+import pytest
+from sqlmodel import Session, text
+
+from app.tests.utils.rpc import RPCServer
+
+# every node call of the tests goes to this local stand-in; the endpoint is set
+# before app.core.config reads the settings
+rpc_server = RPCServer()
+os.environ["INFURA_ENDPOINT"] = rpc_server.url
+
+from app.core.db import engine, init_db  # noqa: E402
+from app.utils import get_main_address  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def db() -> Generator[Session, None, None]:
+    with Session(engine) as session:
+        init_db(session)
+        yield session
+
+
+@pytest.fixture(autouse=True)
+def clean_db(db: Session) -> Generator[None, None, None]:
+    yield
+    # the truncate waits on any transaction the test left open
+    db.rollback()
+    with engine.begin() as conn:
+        conn.execute(text('TRUNCATE transactionhistory, balanceledger, "transaction", addresscreationjob, '
+                          'addressindexcounter, addressnonce, indexercheckpoint'))
+        conn.execute(text("DELETE FROM address WHERE address <> :main").bindparams(main=get_main_address()))
+
+
+@pytest.fixture
+def rpc() -> Generator[RPCServer, None, None]:
+    yield rpc_server
+    rpc_server.reset()
@@ -0,0 +1,61 @@
+from collections import Counter
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from web3 import AsyncWeb3, Web3
+from web3.eth import AsyncEth, Eth
+
+from app.core.config import Settings, settings
+from app.main import app
+from app.tests.utils.rpc import RPCServer
+
+
+@pytest.fixture
+def built(monkeypatch: pytest.MonkeyPatch) -> Counter:
+    """Counts the providers and contract objects built, sync and async."""
+    counts: Counter = Counter()
+
+    def counting(kind: str, original: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            counts[kind] += 1
+            return original(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(Web3.HTTPProvider, "__init__", counting("provider", Web3.HTTPProvider.__init__))
+    monkeypatch.setattr(AsyncWeb3.AsyncHTTPProvider, "__init__", counting("provider", AsyncWeb3.AsyncHTTPProvider.__init__))
+    monkeypatch.setattr(Eth, "contract", counting("contract", Eth.contract))
+    monkeypatch.setattr(AsyncEth, "contract", counting("contract", AsyncEth.contract))
+    return counts
+
+
+def test_provider_and_token_registry_are_built_once(built: Counter) -> None:
+    fresh = Settings()  # type: ignore
+
+    providers = {id(fresh.WEB3_PROVIDER) for _ in range(5)}
+    contracts = {id(fresh.token_by_symbol[symbol]["contract"]) for _ in range(5) for symbol in ("USDC", "PYUSD", "EURC")}
+    for token in fresh.token_by_symbol.values():
+        assert fresh.token_by_contract_address[token["address"]] is token
+
+    assert (len(providers), len(contracts)) == (1, 3)
+    assert built == {"provider": 1, "contract": 3}
+
+
+def test_requests_build_no_provider_or_contract(rpc: RPCServer, built: Counter) -> None:
+    rpc.handlers.update({
+        "eth_blockNumber": lambda: "0x64",
+        "eth_getBalance": lambda address, block: hex(10**18),
+        "eth_call": lambda call, block: "0x" + (5 * 10**6).to_bytes(32, "big").hex(),
+    })
+    # the process-wide instances, built on first use
+    settings.WEB3_PROVIDER, settings.ASYNC_WEB3_PROVIDER, settings.token_by_contract_address
+    built.clear()
+
+    with TestClient(app) as client:
+        for _ in range(3):
+            response = client.get(f"{settings.API_V1_STR}/address/balances")
+            assert response.status_code == 200
+            assert response.json()["data"]["data"][0]["balances"] is not None
+
+    assert built == {}
@@ -0,0 +1,44 @@
+from sqlmodel import Session, func, select
+
+from app import crud
+from app.models import Address, AddressCreationJob
+from app.utils import get_eth_addresses_by_indexes, get_main_address
+
+TAKEN = [3, 5, 6]
+
+
+def create_legacy_addresses(db: Session) -> None:
+    # addresses at arbitrary indexes, as created before the allocator
+    db.add_all(get_eth_addresses_by_indexes(TAKEN))
+    db.commit()
+
+
+def test_reservation_skips_taken_indexes(db: Session) -> None:
+    create_legacy_addresses(db)
+
+    indexes = crud.reserve_address_indexes(session=db, quantity=10)
+    db.commit()
+    # index 0 holds the main address, of the other wallet
+    assert indexes == range(0, 10 + 1 + len(TAKEN))
+    assert crud.get_free_address_indexes(session=db, indexes=indexes) == [1, 2, 4, *range(7, 14)]
+    assert crud.reserve_address_indexes(session=db, quantity=5) == range(14, 19)
+
+
+def test_job_generates_its_quantity_around_taken_indexes(db: Session) -> None:
+    create_legacy_addresses(db)
+    job = AddressCreationJob(quantity=10)
+    db.add(job)
+    db.commit()
+
+    crud.generate_job_addresses(session=db, job=job)
+    assert job.generated_count == 10
+    created = db.exec(select(Address.index, Address.address)
+                      .where(Address.index >= job.first_index, Address.index < job.end_index, Address.address != get_main_address())
+                      .order_by(Address.index)).all()
+    assert [index for index, _ in created] == [1, 2, 3, 4, 5, 6, *range(7, 14)]
+    assert {(index, address) for index, address in created} == {(a.index, a.address) for a in get_eth_addresses_by_indexes(range(1, 14))}
+
+    # a run resumed after a complete one finds no index left to derive
+    crud.generate_job_addresses(session=db, job=job)
+    assert job.generated_count == 10
+    assert db.exec(select(func.count()).select_from(Address)).one() == 1 + 13
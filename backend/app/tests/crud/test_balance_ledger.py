@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from sqlmodel import Session, select, text
+
+from app import crud
+from app.core.db import engine
+from app.models import Address, BalanceLedger, TransactionHistory
+from app.service import ledger_service
+from app.tests.utils.utils import random_address, random_hash
+
+GAS, GAS_PRICE = 100_000, 2 * 10**9
+GAS_COST = Decimal(GAS * GAS_PRICE).scaleb(-18)
+
+
+def create_addresses(db: Session, count: int) -> list[str]:
+    addresses = [random_address() for _ in range(count)]
+    db.add_all([Address(address=address, index=2_000_000 + i) for i, address in enumerate(addresses)])
+    db.commit()
+    return addresses
+
+
+def history(tx_hash: str, from_address: str, to_address: str, amount: int, log_index: int | None, asset: str = "USDC",
+            block_number: int = 10) -> TransactionHistory:
+    return TransactionHistory(transaction_hash=tx_hash, log_index=log_index, from_address=from_address, to_address=to_address,
+                              asset=asset, amount=Decimal(amount), gas=GAS, gas_price=GAS_PRICE, block_number=block_number)
+
+
+def ledger(db: Session) -> dict[tuple[str, str], BalanceLedger]:
+    return {(row.address, row.asset): row for row in db.exec(select(BalanceLedger)).all()}
+
+
+def test_transfers_update_the_ledger(db: Session) -> None:
+    ours, other = create_addresses(db, 2)
+    db.add(history(random_hash(), random_address(), ours, 3, None, asset="ETH", block_number=10))
+    db.commit()
+    # a batch payout from our address, two logs of one transaction
+    tx_hash = random_hash()
+    db.add_all([history(tx_hash, ours, other, 5, 0, block_number=12), history(tx_hash, ours, random_address(), 2, 1, block_number=12)])
+    db.commit()
+
+    rows = ledger(db)
+    assert (rows[(ours, "ETH")].received, rows[(ours, "ETH")].gas_spent) == (Decimal(3), GAS_COST)
+    assert rows[(ours, "ETH")].balance == Decimal(3) - GAS_COST
+    assert (rows[(ours, "USDC")].sent, rows[(ours, "USDC")].balance, rows[(ours, "USDC")].block_number) == (Decimal(7), Decimal(-7), 12)
+    assert rows[(other, "USDC")].received == Decimal(5)
+    assert crud.count_ledger_mismatches(session=db) == 0
+
+
+def test_gas_is_charged_once_whatever_the_insert_order(db: Session) -> None:
+    (ours,) = create_addresses(db, 1)
+    tx_hash = random_hash()
+    # the rows of one transaction recorded by separate statements, the last one without a log index
+    for log_index in (4, 1, None):
+        db.add(history(tx_hash, ours, random_address(), 1, log_index))
+        db.commit()
+
+    assert ledger(db)[(ours, "ETH")].gas_spent == GAS_COST
+    assert crud.count_ledger_mismatches(session=db) == 0
+
+
+def test_check_ledger_repairs_it(db: Session) -> None:
+    ours, other = create_addresses(db, 2)
+    db.add_all([history(random_hash(), other, ours, 5, 0), history(random_hash(), ours, other, 2, 0)])
+    db.commit()
+    expected = {key: (row.received, row.sent, row.gas_spent, row.balance) for key, row in ledger(db).items()}
+
+    db.exec(text("UPDATE balanceledger SET balance = 99 WHERE address = :address AND asset = 'USDC'").bindparams(address=other))
+    db.exec(text("DELETE FROM balanceledger WHERE address = :address AND asset = 'ETH'").bindparams(address=ours))
+    db.commit()
+
+    assert ledger_service.check_ledger() == 2
+    assert ledger_service.check_ledger() == 0
+    db.expire_all()
+    assert {key: (row.received, row.sent, row.gas_spent, row.balance) for key, row in ledger(db).items()} == expected
+
+
+def test_one_worker_checks_the_ledger_at_a_time(db: Session) -> None:
+    ours, other = create_addresses(db, 2)
+    db.add(history(random_hash(), other, ours, 5, 0))
+    db.commit()
+    db.exec(text("DELETE FROM balanceledger WHERE address = :address").bindparams(address=ours))
+    db.commit()
+
+    with engine.connect() as other_worker:
+        other_worker.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ledger_service.LEDGER_CHECK_LOCK})
+        assert ledger_service.check_ledger() == 0
+        other_worker.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ledger_service.LEDGER_CHECK_LOCK})
+
+    assert ledger_service.check_ledger() == 1
@@ -0,0 +1,51 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import async_crud, crud
+from app.core.db import async_engine
+from app.models import TransactionHistory
+from app.tests.utils.utils import random_address, random_hash
+
+
+@pytest.fixture
+def small_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(crud, "HISTORY_INSERT_CHUNK_SIZE", 2)
+
+
+def transfers(tx_hash: str, count: int) -> list[TransactionHistory]:
+    return [TransactionHistory(transaction_hash=tx_hash, log_index=i, from_address=random_address(), to_address=random_address(),
+                               asset="USDC", amount=Decimal(1), gas=50_000, gas_price=10**9, block_number=10)
+            for i in range(count)]
+
+
+def stored(db: Session, tx_hash: str) -> int:
+    return db.exec(select(func.count()).select_from(TransactionHistory).where(TransactionHistory.transaction_hash == tx_hash)).one()
+
+
+def test_bulk_insert_in_chunks(db: Session, small_chunks: None) -> None:
+    tx_hash = random_hash()
+    rows = transfers(tx_hash, 5)
+    crud.bulk_create_transaction_history(session=db, transaction_history=rows[1:2])
+    db.commit()
+
+    assert crud.bulk_create_transaction_history(session=db, transaction_history=rows) == 4
+    db.commit()
+    assert stored(db, tx_hash) == 5
+
+
+def test_async_bulk_insert_in_chunks(db: Session, small_chunks: None) -> None:
+    tx_hash = random_hash()
+    rows = transfers(tx_hash, 5)
+
+    async def insert() -> list[TransactionHistory]:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            await async_crud.bulk_create_transaction_history(session=session, transaction_history=transfers(tx_hash, 2)[1:])
+            return await async_crud.bulk_create_transaction_history(session=session, transaction_history=rows)
+    inserted = asyncio.run(insert())
+
+    assert sorted(h.log_index for h in inserted) == [0, 2, 3, 4]
+    assert stored(db, tx_hash) == 5
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from web3.exceptions import Web3RPCError
+
+from app.core.config import settings
+from app.integration import async_web3_integration, web3_integration
+from app.tests.utils import chain
+from app.tests.utils.rpc import RPCError, RPCServer
+from app.tests.utils.utils import random_address, random_hash
+
+BLOCK = 100
+
+
+@pytest.fixture
+def small_batches(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "WEB3_BATCH_SIZE", 2)
+
+
+def balances_by_address(rpc: RPCServer, addresses: list[str]) -> None:
+    # each address holds its position in wei, the third one is rejected by the node
+    def get_balance(address: str, block: str) -> str:
+        if address == addresses[2]:
+            raise RPCError("missing trie node")
+        return hex(addresses.index(address))
+    rpc.handlers["eth_getBalance"] = get_balance
+
+
+def test_calls_are_sent_in_batches_of_batch_size(rpc: RPCServer, small_batches: None) -> None:
+    addresses = [random_address() for _ in range(5)]
+    balances_by_address(rpc, addresses)
+
+    balances = web3_integration.get_eth_balances(addresses)
+
+    assert [len(request) for request in rpc.requests] == [2, 2, 1]
+    # the responses of each batch come back reversed, results still match their call
+    assert balances == {address: (None if i == 2 else i) for i, address in enumerate(addresses)}
+
+
+def test_async_calls_are_sent_in_batches_of_batch_size(rpc: RPCServer, small_batches: None) -> None:
+    addresses = [random_address() for _ in range(5)]
+    balances_by_address(rpc, addresses)
+
+    results = asyncio.run(async_web3_integration.batch_request([("eth_getBalance", [a, "latest"]) for a in addresses]))
+
+    assert sorted(len(request) for request in rpc.requests) == [1, 2, 2]
+    assert isinstance(results[2], Web3RPCError)
+    assert [r for i, r in enumerate(results) if i != 2] == [0, 1, 3, 4]
+
+
+def test_errors_are_kept_on_request(rpc: RPCServer) -> None:
+    mined, failing, unknown = random_hash(), random_hash(), random_hash()
+    transactions = {mined: chain.transaction(mined, random_address(), random_address(), BLOCK, value=7), unknown: None}
+
+    def get_transaction(tx_hash: str) -> dict | None:
+        if tx_hash == failing:
+            raise RPCError("header not found")
+        return transactions[tx_hash]
+    rpc.handlers["eth_getTransactionByHash"] = get_transaction
+
+    results = web3_integration.get_transactions([mined, failing, unknown], keep_errors=True)
+
+    # formatted like web3's own calls
+    assert (results[mined].blockNumber, results[mined]["value"]) == (BLOCK, 7)
+    assert isinstance(results[failing], Web3RPCError)
+    assert results[unknown] is None
+    assert web3_integration.get_transactions([failing])[failing] is None
+
+
+def test_final_results_are_cached(rpc: RPCServer) -> None:
+    tx_hash = random_hash()
+    rpc.handlers.update({
+        "eth_blockNumber": lambda: hex(BLOCK + settings.CONFIRMATIONS_REQUIRED),
+        "eth_getTransactionReceipt": lambda h: chain.receipt(h, random_address(), random_address(), BLOCK),
+    })
+    web3_integration.get_block_number()
+
+    first = web3_integration.get_transaction_receipts([tx_hash])
+    second = web3_integration.get_transaction_receipts([tx_hash])
+
+    assert first == second
+    assert len(rpc.calls("eth_getTransactionReceipt")) == 1
+
+
+def test_a_rejected_batch_raises(rpc: RPCServer) -> None:
+    rpc.batch_error = "batch requests are not supported"
+
+    with pytest.raises(Web3RPCError, match="not supported"):
+        web3_integration.get_eth_balances([random_address(), random_address()])
+
+
+def test_results_are_formatted_like_web3_calls(rpc: RPCServer) -> None:
+    tx_hash, sender, token = random_hash(), random_address(), settings.token_by_symbol["USDC"]["address"]
+    log = chain.transfer_log(token, sender, random_address(), 5, 0, tx_hash, BLOCK)
+    rpc.handlers.update({
+        "eth_getTransactionByHash": lambda h: chain.transaction(h, sender.lower(), token.lower(), BLOCK, data="0xa9059cbb"),
+        "eth_getTransactionReceipt": lambda h: chain.receipt(h, sender.lower(), token.lower(), BLOCK, [log]),
+        "eth_getBalance": lambda address, block: hex(10**18),
+        "eth_getCode": lambda address, block: "0x6080",
+        "eth_feeHistory": lambda count, newest, percentiles: {
+            "oldestBlock": hex(BLOCK), "baseFeePerGas": ["0x3b9aca00", "0x3b9aca01"], "gasUsedRatio": [0.5],
+            "reward": [["0x5f5e100"]]},
+    })
+    web3 = web3_integration.web3
+
+    assert web3_integration.get_transactions([tx_hash])[tx_hash] == web3.eth.get_transaction(tx_hash)
+    assert web3_integration.get_transaction_receipts([tx_hash])[tx_hash] == web3.eth.get_transaction_receipt(tx_hash)
+    assert web3_integration.get_eth_balances([sender])[sender] == web3.eth.get_balance(sender)
+    assert web3_integration.get_codes([token])[token] == web3.eth.get_code(token)
+    (fee_history,) = web3_integration.batch_request([("eth_feeHistory", ["0x1", "latest", [50]])])
+    assert fee_history == web3.eth.fee_history(1, "latest", [50])
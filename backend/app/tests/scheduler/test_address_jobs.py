@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlmodel import Session
+
+from app import crud
+from app.api.models.models import AddressCreationStatus
+from app.core.config import settings
+from app.models import AddressCreationJob
+from app.scheduler import schedulers
+
+
+@pytest.fixture
+def runs(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """Attempts of the address jobs, which all fail."""
+    runs = []
+
+    def generate_job_addresses(*, session: Session, job: AddressCreationJob) -> None:
+        runs.append(job.attempts)
+        raise RuntimeError("connection reset")
+    monkeypatch.setattr(crud, "generate_job_addresses", generate_job_addresses)
+    return runs
+
+
+def run_due(db: Session, job: AddressCreationJob) -> AddressCreationJob:
+    """Runs the address jobs with the retry of job due, and returns it after the run."""
+    db.expire_all()
+    job = db.get(AddressCreationJob, job.id)
+    if job.next_attempt_at is not None:
+        job.next_attempt_at = datetime.now(timezone.utc)
+        db.add(job)
+        db.commit()
+    schedulers.run_address_jobs()
+    db.expire_all()
+    return db.get(AddressCreationJob, job.id)
+
+
+def test_failed_job_waits_before_running_again(db: Session, runs: list[int]) -> None:
+    job = AddressCreationJob(quantity=10)
+    db.add(job)
+    db.commit()
+
+    schedulers.run_address_jobs()
+    db.expire_all()
+    job = db.get(AddressCreationJob, job.id)
+    # one run, the job is not taken again until its retry is due
+    assert runs == [0]
+    assert (job.status, job.attempts, job.last_error) == (AddressCreationStatus.PENDING, 1, "connection reset")
+    assert (job.next_attempt_at - datetime.now(timezone.utc)).total_seconds() > settings.ADDRESS_JOB_RETRY_BASE_SECONDS - 5
+
+    while job.status == AddressCreationStatus.PENDING:
+        job = run_due(db, job)
+
+    assert runs == list(range(settings.ADDRESS_JOB_MAX_ATTEMPTS))
+    assert (job.attempts, job.next_attempt_at) == (settings.ADDRESS_JOB_MAX_ATTEMPTS, None)
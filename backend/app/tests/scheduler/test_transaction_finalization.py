@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+import pytest
+from sqlmodel import Session, select
+
+from app.api.models.models import TransactionStatus
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Address, BalanceLedger, Transaction, TransactionHistory
+from app.scheduler import schedulers
+from app.service import transaction_service
+from app.tests.utils import chain
+from app.tests.utils.rpc import RPCError, RPCServer
+from app.tests.utils.utils import random_address, random_hash
+
+BLOCK = 100
+LOG_INDEX = 3
+
+
+@pytest.fixture
+def token_send(db: Session, rpc: RPCServer) -> Transaction:
+    """A mined send of 2 USDC between two of our addresses, with another token's transfer logged before it."""
+    sender, recipient = random_address(), random_address()
+    db.add_all([Address(address=sender, index=1_000_001), Address(address=recipient, index=1_000_002)])
+    t = Transaction(from_address=sender, to_address=recipient, asset="USDC", amount=Decimal(2),
+                    transaction_hash=random_hash(), status=TransactionStatus.STARTED)
+    db.add(t)
+    db.commit()
+    db.refresh(t)
+
+    usdc, eurc = settings.token_by_symbol["USDC"]["address"], settings.token_by_symbol["EURC"]["address"]
+    logs = [chain.transfer_log(eurc, random_address(), random_address(), 5, LOG_INDEX - 1, t.transaction_hash, BLOCK),
+            chain.transfer_log(usdc, sender, recipient, 2_000_000, LOG_INDEX, t.transaction_hash, BLOCK)]
+    receipt = chain.receipt(t.transaction_hash, sender, usdc, BLOCK, logs)
+    tx = chain.transaction(t.transaction_hash, sender, usdc, BLOCK, data="0xa9059cbb")
+    rpc.handlers.update({
+        "eth_blockNumber": lambda: hex(BLOCK + settings.CONFIRMATIONS_REQUIRED),
+        "eth_getTransactionReceipt": lambda tx_hash: receipt if tx_hash == t.transaction_hash else None,
+        "eth_getTransactionByHash": lambda tx_hash: tx if tx_hash == t.transaction_hash else None,
+        "eth_getCode": lambda address, block: "0x6080",
+    })
+    return t
+
+
+def recorded(t: Transaction) -> tuple[list[TransactionHistory], dict[tuple[str, str], BalanceLedger]]:
+    with Session(engine) as session:
+        history = session.exec(select(TransactionHistory).where(TransactionHistory.transaction_hash == t.transaction_hash)).all()
+        ledger = session.exec(select(BalanceLedger).where(BalanceLedger.address.in_([t.from_address, t.to_address]))).all()
+    return history, {(row.address, row.asset): row for row in ledger}
+
+
+def assert_recorded_once(t: Transaction) -> None:
+    history, ledger = recorded(t)
+    assert [(h.log_index, h.amount) for h in history] == [(LOG_INDEX, Decimal(2))]
+    assert ledger[(t.to_address, "USDC")].received == Decimal(2)
+    assert ledger[(t.from_address, "USDC")].sent == Decimal(2)
+    assert ledger[(t.from_address, "ETH")].gas_spent == Decimal(50_000 * chain.GAS_PRICE).scaleb(-18)
+
+
+def test_confirm_then_validate(db: Session, token_send: Transaction) -> None:
+    schedulers.check_transaction_finalization()
+
+    with pytest.raises(Exception):
+        # already recorded
+        transaction_service.validate_transaction_hash(db, token_send.transaction_hash)
+    db.refresh(token_send)
+    assert token_send.status == TransactionStatus.CONFIRMED
+    assert token_send.log_index == LOG_INDEX
+    assert_recorded_once(token_send)
+
+
+def test_validate_then_confirm(db: Session, token_send: Transaction) -> None:
+    transaction_service.validate_transaction_hash(db, token_send.transaction_hash)
+    schedulers.check_transaction_finalization()
+
+    db.refresh(token_send)
+    assert token_send.status == TransactionStatus.CONFIRMED
+    assert_recorded_once(token_send)
+
+
+@pytest.fixture
+def unmined_send(db: Session, rpc: RPCServer) -> Transaction:
+    t = Transaction(from_address=random_address(), to_address=random_address(), asset="ETH", amount=Decimal(1),
+                    transaction_hash=random_hash(), status=TransactionStatus.STARTED)
+    db.add(t)
+    db.commit()
+    db.refresh(t)
+    rpc.handlers.update({
+        "eth_getTransactionReceipt": lambda tx_hash: None,
+        "eth_getTransactionByHash": lambda tx_hash: None,
+        "eth_getTransactionCount": lambda address, block: "0x3",
+    })
+    return t
+
+
+def finalize_at(db: Session, rpc: RPCServer, t: Transaction, head: int) -> Transaction:
+    rpc.handlers["eth_blockNumber"] = lambda: hex(head)
+    schedulers.check_transaction_finalization()
+    db.expire_all()
+    return db.get(Transaction, t.id)
+
+
+def test_missing_transaction_is_dropped_after_a_grace_period(db: Session, rpc: RPCServer, unmined_send: Transaction) -> None:
+    t = finalize_at(db, rpc, unmined_send, BLOCK)
+    assert (t.status, t.missing_since_block) == (TransactionStatus.STARTED, BLOCK)
+
+    t = finalize_at(db, rpc, t, BLOCK + settings.TRANSACTION_DROPPED_AFTER_BLOCKS - 1)
+    assert t.status == TransactionStatus.STARTED
+    assert not rpc.calls("eth_getTransactionCount")
+
+    t = finalize_at(db, rpc, t, BLOCK + settings.TRANSACTION_DROPPED_AFTER_BLOCKS)
+    assert t.status == TransactionStatus.FAILED
+    # the nonce of the dropped transaction is resynced from the chain
+    assert rpc.calls("eth_getTransactionCount") == [[t.from_address, "pending"]]
+
+
+def test_pending_transaction_is_not_dropped(db: Session, rpc: RPCServer, unmined_send: Transaction) -> None:
+    t = finalize_at(db, rpc, unmined_send, BLOCK)
+    pending = chain.transaction(t.transaction_hash, t.from_address, t.to_address, None, value=10**18)
+    rpc.handlers["eth_getTransactionByHash"] = lambda tx_hash: pending
+
+    t = finalize_at(db, rpc, t, BLOCK + settings.TRANSACTION_DROPPED_AFTER_BLOCKS)
+    assert (t.status, t.missing_since_block) == (TransactionStatus.STARTED, None)
+
+
+@pytest.mark.parametrize("method", ["eth_getTransactionReceipt", "eth_getTransactionByHash"])
+def test_rpc_errors_are_not_drops(db: Session, rpc: RPCServer, unmined_send: Transaction, method: str) -> None:
+    def fail(tx_hash: str) -> None:
+        raise RPCError("header not found")
+    rpc.handlers[method] = fail
+
+    for head in (BLOCK, BLOCK + settings.TRANSACTION_DROPPED_AFTER_BLOCKS):
+        t = finalize_at(db, rpc, unmined_send, head)
+        assert (t.status, t.missing_since_block) == (TransactionStatus.STARTED, None)
@@ -0,0 +1,32 @@
+import pytest
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import Address
+from app.service import address_index
+from app.tests.utils.utils import random_address
+
+
+@pytest.fixture(params=["set", "bloom"])
+def loaded_index(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> None:
+    """An index of each mode loaded from the current table, put back as it was after the test."""
+    for name in ("_members", "_count", "_watermark"):
+        monkeypatch.setattr(address_index, name, getattr(address_index, name))
+    if request.param == "bloom":
+        monkeypatch.setattr(settings, "ADDRESS_INDEX_BLOOM_THRESHOLD", 0)
+    address_index.warm_up()
+    assert isinstance(address_index._members, set if request.param == "set" else address_index.BloomFilter)
+
+
+def test_addresses_created_after_the_load_are_found(db: Session, loaded_index: None) -> None:
+    old = random_address()
+    db.add(Address(address=old, index=3_000_000))
+    db.commit()
+    address_index.refresh()
+
+    new = random_address()
+    db.add(Address(address=new, index=3_000_001))
+    db.commit()
+
+    assert address_index.contains_many([old, new, random_address()], session=db) == {old, new}
+    assert address_index.contains(new)
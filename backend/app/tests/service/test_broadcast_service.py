@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+import pytest
+from sqlmodel import Session
+from web3 import Web3
+
+from app.api.models.models import TransactionStatus
+from app.core.config import settings
+from app.integration import fee_oracle
+from app.models import Address, AddressNonce, Transaction
+from app.service import broadcast_service, lease_service
+from app.tests.utils.rpc import RPCError, RPCServer
+from app.utils import get_eth_addresses_by_indexes
+
+CHAIN_NONCE = 5
+GAS_LIMIT = 80_000
+
+
+class DroppedConnection(Exception):
+    pass
+
+
+@pytest.fixture
+def pending(db: Session, rpc: RPCServer, monkeypatch: pytest.MonkeyPatch) -> Transaction:
+    """A PENDING USDC transfer leased to this worker, from a funded address of ours."""
+    (sender,) = get_eth_addresses_by_indexes([7])
+    db.add(Address(address=sender.address, index=7))
+    t = Transaction(from_address=sender.address, to_address=Web3.to_checksum_address("0x" + "42" * 20), asset="USDC",
+                    amount=Decimal(1), status=TransactionStatus.PENDING, claimed_by=lease_service.worker_id())
+    db.add(t)
+    db.commit()
+    db.refresh(t)
+
+    monkeypatch.setattr(fee_oracle, "get_fees", lambda: fee_oracle.FeeSnapshot(
+        block_number=1, gas_price=10**9, base_fee=10**9, priority_fee=10**8, fetched_at=0))
+    rpc.handlers.update({
+        "eth_getBalance": lambda address, block: hex(10**18),
+        "eth_estimateGas": lambda *args: hex(50_000),
+        "eth_getTransactionCount": lambda address, block: hex(CHAIN_NONCE),
+    })
+    return t
+
+
+def broadcast(db: Session, t: Transaction) -> Transaction:
+    broadcast_service.broadcast_sender(t.from_address, [t.id])
+    db.expire_all()
+    return db.get(Transaction, t.id)
+
+
+def sent_hash(rpc: RPCServer) -> str:
+    (raw_transaction,) = rpc.calls("eth_sendRawTransaction")[-1]
+    return Web3.keccak(hexstr=raw_transaction).to_0x_hex()
+
+
+def next_nonce(db: Session, address: str) -> int:
+    return db.get(AddressNonce, address).next_nonce
+
+
+def test_broadcast(db: Session, rpc: RPCServer, pending: Transaction) -> None:
+    rpc.handlers["eth_sendRawTransaction"] = lambda raw: Web3.keccak(hexstr=raw).to_0x_hex()
+
+    t = broadcast(db, pending)
+    assert (t.status, t.transaction_hash, t.attempts) == (TransactionStatus.STARTED, sent_hash(rpc), 0)
+    assert next_nonce(db, t.from_address) == CHAIN_NONCE + 1
+
+
+@pytest.mark.parametrize("error", [RPCError("already known"), RPCError("nonce too low"), DroppedConnection()])
+def test_unknown_outcome_is_left_to_finalization(db: Session, rpc: RPCServer, pending: Transaction, error: Exception) -> None:
+    def send(raw: str) -> None:
+        raise error
+    rpc.handlers["eth_sendRawTransaction"] = send
+
+    t = broadcast(db, pending)
+    # never signed again under another nonce
+    assert (t.status, t.transaction_hash, t.attempts) == (TransactionStatus.STARTED, sent_hash(rpc), 0)
+    assert len(rpc.calls("eth_sendRawTransaction")) == 1
+
+
+def test_rejected_send_is_retried(db: Session, rpc: RPCServer, pending: Transaction) -> None:
+    def send(raw: str) -> None:
+        raise RPCError("insufficient funds for gas * price + value")
+    rpc.handlers["eth_sendRawTransaction"] = send
+
+    t = broadcast(db, pending)
+    assert (t.status, t.transaction_hash, t.attempts) == (TransactionStatus.RETRYING, None, 1)
+    assert t.next_attempt_at is not None
+    # the nonce was not used
+    assert next_nonce(db, t.from_address) == CHAIN_NONCE
+
+
+@pytest.mark.parametrize("balance", [GAS_LIMIT * (2 * 10**9 + 10**8), GAS_LIMIT * (10**9 + 10**8)])
+def test_broadcast_with_the_funded_gas_limit(db: Session, rpc: RPCServer, pending: Transaction, balance: int) -> None:
+    """Funded for its stored gas limit, at the current max fee or only at the current base fee."""
+    pending.gas_limit = GAS_LIMIT
+    db.add(pending)
+    db.commit()
+    rpc.handlers.update({
+        "eth_getBalance": lambda address, block: hex(balance),
+        # the estimate went up since the transfer was created
+        "eth_chainId": lambda: hex(int(settings.CHAIN_ID)),
+        "eth_estimateGas": lambda *args: hex(2 * GAS_LIMIT),
+        "eth_sendRawTransaction": lambda raw: Web3.keccak(hexstr=raw).to_0x_hex(),
+    })
+
+    t = broadcast(db, pending)
+    assert (t.status, t.attempts) == (TransactionStatus.STARTED, 0)
+    assert not rpc.calls("eth_estimateGas")
@@ -0,0 +1,28 @@
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.service import deposit_indexer
+from app.tests.utils.rpc import RPCServer
+
+
+def test_checkpoint_never_moves_back(db: Session) -> None:
+    for block_number in (10, 5):
+        crud.set_indexer_checkpoint(session=db, name=deposit_indexer.CHECKPOINT, block_number=block_number)
+        db.commit()
+
+    assert crud.get_indexer_checkpoint(session=db, name=deposit_indexer.CHECKPOINT) == 10
+
+
+def test_one_worker_indexes_at_a_time(db: Session, rpc: RPCServer) -> None:
+    crud.set_indexer_checkpoint(session=db, name=deposit_indexer.CHECKPOINT, block_number=10)
+    db.commit()
+
+    with engine.connect() as other_worker:
+        other_worker.execute(text("SELECT pg_advisory_lock(:key)"), {"key": deposit_indexer.INDEXER_LOCK})
+        assert deposit_indexer.run(to_block=20) == 0
+        other_worker.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": deposit_indexer.INDEXER_LOCK})
+
+    assert rpc.requests == []
+    assert crud.get_indexer_checkpoint(session=db, name=deposit_indexer.CHECKPOINT) == 10
@@ -0,0 +1,30 @@
+import multiprocessing
+import os
+from collections.abc import Generator
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from app import utils
+from app.core.config import settings
+
+
+@pytest.fixture
+def broken_pool(monkeypatch: pytest.MonkeyPatch) -> Generator[ProcessPoolExecutor, None, None]:
+    """A derivation pool whose worker died, and the pool started to replace it shut down afterwards."""
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork"))
+    with pytest.raises(Exception):
+        pool.submit(os._exit, 1).result()
+    monkeypatch.setattr(utils, "_derivation_pool", pool)
+    yield pool
+    if utils._derivation_pool is not None:
+        utils._derivation_pool.shutdown()
+
+
+def test_a_broken_derivation_pool_is_replaced(broken_pool: ProcessPoolExecutor) -> None:
+    indexes = range(10, 16)
+
+    chunks = list(utils.derive_addresses_parallel(settings.USER_MNEMONIC, indexes, chunk_size=2))
+
+    assert chunks == [utils.derive_addresses(settings.USER_MNEMONIC, indexes[i:i + 2]) for i in range(0, 6, 2)]
+    assert utils._derivation_pool not in (None, broken_pool)
@@ -0,0 +1,42 @@
+from typing import Any
+
+from app.integration.token_transfers import TRANSFER_TOPIC
+
+# JSON-RPC shaped chain data for the stand-in node, quantities hex encoded
+
+BLOCK_HASH = "0x" + "ab" * 32
+GAS_PRICE = 10**9
+
+
+def _topic(address: str) -> str:
+    return "0x" + address[2:].lower().rjust(64, "0")
+
+
+def transfer_log(token: str, from_address: str, to_address: str, value: int, log_index: int,
+                 tx_hash: str, block_number: int) -> dict[str, Any]:
+    return {
+        "address": token, "blockHash": BLOCK_HASH, "blockNumber": hex(block_number), "data": "0x" + value.to_bytes(32, "big").hex(),
+        "logIndex": hex(log_index), "removed": False, "topics": ["0x" + TRANSFER_TOPIC.hex(), _topic(from_address), _topic(to_address)],
+        "transactionHash": tx_hash, "transactionIndex": "0x0",
+    }
+
+
+def receipt(tx_hash: str, from_address: str, to_address: str, block_number: int, logs: list[dict[str, Any]] = (),
+            status: int = 1, gas_used: int = 50_000) -> dict[str, Any]:
+    return {
+        "blockHash": BLOCK_HASH, "blockNumber": hex(block_number), "contractAddress": None, "cumulativeGasUsed": hex(gas_used),
+        "effectiveGasPrice": hex(GAS_PRICE), "from": from_address, "gasUsed": hex(gas_used), "logs": list(logs),
+        "logsBloom": "0x" + "00" * 256, "status": hex(status), "to": to_address, "transactionHash": tx_hash,
+        "transactionIndex": "0x0", "type": "0x2",
+    }
+
+
+def transaction(tx_hash: str, from_address: str, to_address: str, block_number: int | None, value: int = 0,
+                data: str = "0x") -> dict[str, Any]:
+    return {
+        "blockHash": BLOCK_HASH if block_number is not None else None,
+        "blockNumber": hex(block_number) if block_number is not None else None,
+        "from": from_address, "gas": hex(100_000), "gasPrice": hex(GAS_PRICE), "hash": tx_hash, "input": data, "nonce": "0x0",
+        "to": to_address, "transactionIndex": "0x0" if block_number is not None else None, "value": hex(value), "type": "0x0",
+        "chainId": "0x1", "v": "0x25", "r": "0x" + "11" * 32, "s": "0x" + "22" * 32,
+    }
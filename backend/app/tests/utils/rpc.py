@@ -0,0 +1,93 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+
+class RPCError(Exception):
+    """Raised by a handler to answer its call with a JSON-RPC error."""
+
+    def __init__(self, message: str, code: int = -32000) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+class RPCServer:
+    """
+    Local stand-in for the JSON-RPC node. Each method is answered by the
+    handler registered for it, called with the params of the call; a handler
+    raises RPCError to answer with an error, or anything else to drop the
+    connection, like a node that timed out. Every HTTP request is recorded, so
+    tests can count round trips. Batch responses come back in reverse order,
+    nodes don't guarantee it. Setting batch_error answers every batch with that
+    error as a whole, like a node that doesn't take batches.
+    """
+
+    def __init__(self) -> None:
+        self.handlers: dict[str, Callable[..., Any]] = {}
+        self.requests: list[Any] = []
+        self.batch_error: str | None = None
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._request_handler())
+        threading.Thread(target=self._server.serve_forever, name="rpc-server", daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def reset(self) -> None:
+        self.handlers.clear()
+        self.requests.clear()
+        self.batch_error = None
+
+    def calls(self, method: str) -> list[list[Any]]:
+        """Params of every call of method received so far, batched or not."""
+        calls = []
+        for request in self.requests:
+            for call in request if isinstance(request, list) else [request]:
+                if call["method"] == method:
+                    calls.append(call["params"])
+        return calls
+
+    def _answer(self, call: dict[str, Any]) -> dict[str, Any]:
+        response: dict[str, Any] = {"jsonrpc": "2.0", "id": call["id"]}
+        handler = self.handlers.get(call["method"])
+        if handler is None:
+            response["error"] = {"code": -32601, "message": f"the method {call['method']} does not exist"}
+            return response
+        try:
+            response["result"] = handler(*call["params"])
+        except RPCError as e:
+            response["error"] = {"code": e.code, "message": str(e)}
+        return response
+
+    def _request_handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests.append(request)
+                try:
+                    if isinstance(request, list) and server.batch_error is not None:
+                        response = {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": server.batch_error}}
+                    elif isinstance(request, list):
+                        response = [server._answer(call) for call in reversed(request)]
+                    else:
+                        response = server._answer(request)
+                except Exception:
+                    # any other error of a handler drops the connection without an answer
+                    self.close_connection = True
+                    return
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
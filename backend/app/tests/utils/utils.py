@@ -0,0 +1,11 @@
+import os
+
+from web3 import Web3
+
+
+def random_address() -> str:
+    return Web3.to_checksum_address("0x" + os.urandom(20).hex())
+
+
+def random_hash() -> str:
+    return "0x" + os.urandom(32).hex()
@@ -1,5 +1,14 @@
+import base64
 import logging
-import random
+import multiprocessing
+import uuid
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import lru_cache
+from itertools import repeat
 from bip_utils import Bip39SeedGenerator, Bip44, Bip44Coins, Bip44Changes
 
 from app.models import Address
@@ -10,13 +19,71 @@ web3 = settings.WEB3_PROVIDER
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_address_data_by_index_and_mnemonic(mnemonic: str, index: int):
+@lru_cache(maxsize=8)
+def get_change_node_by_mnemonic(mnemonic: str) -> Bip44:
+    # seed generation (PBKDF2, 2048 rounds) and the hardened path down to
+    # m/44'/60'/0'/0 only need to run once per mnemonic
     seed_bytes = Bip39SeedGenerator(mnemonic).Generate()
     bip44_def_ctx = Bip44.FromSeed(seed_bytes, Bip44Coins.ETHEREUM)
-    return bip44_def_ctx.Purpose().Coin().Account(0).Change(Bip44Changes.CHAIN_EXT).AddressIndex(index)
+    return bip44_def_ctx.Purpose().Coin().Account(0).Change(Bip44Changes.CHAIN_EXT)
+
+def get_address_data_by_index_and_mnemonic(mnemonic: str, index: int):
+    return get_change_node_by_mnemonic(mnemonic).AddressIndex(index)
+
+def derive_addresses(mnemonic: str, indexes: Iterable[int]) -> list[tuple[int, str]]:
+    change_node = get_change_node_by_mnemonic(mnemonic)
+    return [(index, change_node.AddressIndex(index).PublicKey().ToAddress()) for index in indexes]
+
+_derivation_pool: ProcessPoolExecutor | None = None
+_derivation_pool_lock = threading.Lock()
+
+def get_derivation_pool() -> ProcessPoolExecutor:
+    global _derivation_pool
+    with _derivation_pool_lock:
+        if _derivation_pool is None:
+            # spawn instead of fork: the scheduler calls this from a worker thread
+            _derivation_pool = ProcessPoolExecutor(
+                max_workers=settings.ADDRESS_GENERATION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _derivation_pool
+
+def discard_derivation_pool(pool: ProcessPoolExecutor) -> None:
+    """Drops a pool that lost a worker, it fails every call after that; the next call starts a new one."""
+    global _derivation_pool
+    with _derivation_pool_lock:
+        if _derivation_pool is pool:
+            _derivation_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def derive_addresses_parallel(mnemonic: str, indexes: range | list[int], chunk_size: int) -> Iterator[list[tuple[int, str]]]:
+    chunks = [indexes[i:i + chunk_size] for i in range(0, len(indexes), chunk_size)]
+    if len(chunks) <= 1:
+        yield from (derive_addresses(mnemonic, chunk) for chunk in chunks)
+        return
+    done = 0
+    for attempt in range(2):
+        pool = get_derivation_pool()
+        try:
+            # chunks come back in order, so the caller can persist one while the pool derives the next ones
+            for chunk in pool.map(derive_addresses, repeat(mnemonic), chunks[done:]):
+                yield chunk
+                done += 1
+            return
+        except BrokenProcessPool:
+            discard_derivation_pool(pool)
+            if attempt:
+                raise
+            logger.warning("Address derivation pool lost a worker, deriving the %s remaining chunks in a new one",
+                           len(chunks) - done)
+
+def generate_eth_addresses(indexes: range | list[int]) -> Iterator[list[tuple[int, str]]]:
+    return derive_addresses_parallel(settings.USER_MNEMONIC, indexes, settings.ADDRESS_GENERATION_CHUNK_SIZE)
+
+def get_eth_addresses_by_indexes(indexes: Iterable[int]) -> list[Address]:
+    return [Address(address=address, index=index) for index, address in derive_addresses(settings.USER_MNEMONIC, indexes)]
 
-def get_random_eth_address() -> Address:
-    index = random.randint(0, 2 ** 32 - 1)
+def get_eth_address_by_index(index: int) -> Address:
     user_mnemonic = settings.USER_MNEMONIC
     address_data = get_address_data_by_index_and_mnemonic(user_mnemonic, index)
     address = address_data.PublicKey().ToAddress()
@@ -39,4 +106,13 @@ def get_address_data_from_master(index: int):
     user_mnemonic = settings.MAIN_USER_MNEMONIC
     return get_address_data_by_index_and_mnemonic(user_mnemonic, index)
 
+# opaque keyset pagination cursors over (created_at, id)
+def encode_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{id}".encode()).decode()
 
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(id)
+    except Exception:
+        raise ValueError("Invalid cursor.")
@@ -0,0 +1,36 @@
+"""
+Background worker, runs the scheduler jobs out of the API process:
+
+    python -m app.worker
+
+Any number of workers can run against the same database, the queues they work
+on are claimed with leases (see app.service.lease_service).
+"""
+import logging
+import signal
+import threading
+
+from app.scheduler import schedulers
+from app.service import address_index, lease_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+
+    address_index.start()
+    scheduler = schedulers.start_scheduler()
+    logger.info("Worker %s started", lease_service.worker_id())
+
+    stop.wait()
+    logger.info("Worker %s stopping, waiting for the running jobs", lease_service.worker_id())
+    # jobs cut short here leave their leases to expire
+    schedulers.stop_scheduler(scheduler)
+
+
+if __name__ == "__main__":
+    main()
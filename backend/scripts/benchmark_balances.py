@@ -0,0 +1,63 @@
+"""
+Reads the ETH and registry token balances of N addresses one RPC call at a
+time (get_balance plus balanceOf per token) and through
+async_web3_integration.get_balances (concurrent JSON-RPC batches), then again
+from the per-block cache. Point INFURA_ENDPOINT at a local dev chain (anvil,
+hardhat) with the tokens deployed or forked.
+
+    python -m scripts.benchmark_balances [--addresses N] [--sequential-sample N]
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.integration import async_web3_integration, web3_integration
+from app.utils import get_eth_addresses_by_indexes
+
+
+def read_sequentially(addresses: list[str], block_number: int) -> None:
+    web3 = settings.WEB3_PROVIDER
+    for address in addresses:
+        web3.eth.get_balance(address, block_identifier=block_number)
+        for token in settings.token_by_symbol.values():
+            try:
+                token["contract"].functions.balanceOf(address).call(block_identifier=block_number)
+            except Exception:
+                # no token code at that address on this chain
+                pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--addresses", type=int, default=10_000)
+    # the one-by-one path is extrapolated from the first addresses
+    parser.add_argument("--sequential-sample", type=int, default=500)
+    args = parser.parse_args()
+
+    addresses = [address.address for address in get_eth_addresses_by_indexes(range(args.addresses))]
+    block_number = web3_integration.get_block_number()
+    calls = len(web3_integration.balance_calls(addresses[0], block_number)) * len(addresses)
+
+    sample = addresses[:args.sequential_sample]
+    start = time.perf_counter()
+    read_sequentially(sample, block_number)
+    sequential = (time.perf_counter() - start) * len(addresses) / len(sample)
+
+    start = time.perf_counter()
+    balances = asyncio.run(async_web3_integration.get_balances(addresses, block_number))
+    batched = time.perf_counter() - start
+    failed = sum(1 for value in balances.values() if value is None)
+
+    start = time.perf_counter()
+    asyncio.run(async_web3_integration.get_balances(addresses, block_number))
+    cached = time.perf_counter() - start
+
+    print(f"{len(addresses):,} addresses, {calls:,} calls at block {block_number}")
+    print(f"one by one: {sequential:.1f}s (extrapolated from {len(sample)} addresses)")
+    print(f"batched:    {batched:.1f}s ({sequential / batched:.0f}x), {failed} addresses failed")
+    print(f"cached:     {cached * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Compares the address derivation throughput of the uncached path (seed + full
+BIP44 path per address) against the cached change node.
+
+    python -m scripts.benchmark_derivation [quantity]
+"""
+import sys
+import time
+
+from bip_utils import Bip39SeedGenerator, Bip44, Bip44Changes, Bip44Coins
+
+from app.core.config import settings
+from app.utils import derive_addresses, get_change_node_by_mnemonic
+
+
+def derive_uncached(mnemonic: str, index: int) -> str:
+    seed_bytes = Bip39SeedGenerator(mnemonic).Generate()
+    bip44_def_ctx = Bip44.FromSeed(seed_bytes, Bip44Coins.ETHEREUM)
+    address_data = bip44_def_ctx.Purpose().Coin().Account(0).Change(Bip44Changes.CHAIN_EXT).AddressIndex(index)
+    return address_data.PublicKey().ToAddress()
+
+
+def main() -> None:
+    quantity = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    mnemonic = settings.USER_MNEMONIC
+
+    start = time.perf_counter()
+    uncached = [derive_uncached(mnemonic, index) for index in range(quantity)]
+    uncached_elapsed = time.perf_counter() - start
+
+    get_change_node_by_mnemonic.cache_clear()
+    start = time.perf_counter()
+    cached = [address for _, address in derive_addresses(mnemonic, range(quantity))]
+    cached_elapsed = time.perf_counter() - start
+
+    assert uncached == cached, "cached derivation diverged from the uncached path"
+
+    print(f"uncached: {quantity / uncached_elapsed:,.0f} addresses/s ({uncached_elapsed:.3f}s)")
+    print(f"cached:   {quantity / cached_elapsed:,.0f} addresses/s ({cached_elapsed:.3f}s)")
+    print(f"speedup:  {uncached_elapsed / cached_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
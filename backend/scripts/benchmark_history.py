@@ -0,0 +1,76 @@
+"""
+Benchmarks the transaction history query on a large synthetic table.
+Seeds --rows fake transfers spread over --addresses addresses, then times
+walking the first pages of one address and prints the query plan.
+Run it against a scratch database, it writes to transactionhistory.
+
+    python -m scripts.benchmark_history [--rows 10000000] [--addresses 10000] [--pages 20]
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel
+
+from app import crud
+from app.core.db import engine
+
+SEED = text("""
+    INSERT INTO transactionhistory (id, transaction_hash, from_address, to_address, asset, amount, gas, gas_price, block_number, created_at)
+    SELECT gen_random_uuid(),
+           '0x' || md5(g::text) || md5((g + :offset)::text),
+           '0x' || lpad(to_hex(g % :addresses), 40, '0'),
+           '0x' || lpad(to_hex((g * 7 + 1) % :addresses), 40, '0'),
+           (ARRAY['ETH', 'USDC', 'PYUSD', 'EURC'])[1 + g % 4],
+           1, 21000, 1000000000, g / 10,
+           now() - make_interval(secs => :rows - g)
+    FROM generate_series(:start, :end) AS g
+""")
+
+
+def address_of(n: int) -> str:
+    return "0x" + format(n, "x").rjust(40, "0")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--addresses", type=int, default=10_000)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        start = time.perf_counter()
+        for batch_start in range(0, args.rows, args.batch):
+            batch_end = min(batch_start + args.batch, args.rows) - 1
+            session.exec(SEED.bindparams(start=batch_start, end=batch_end, offset=args.rows,
+                                         addresses=args.addresses, rows=args.rows))
+            session.commit()
+        session.exec(text("ANALYZE transactionhistory"))
+        session.commit()
+        print(f"seeded {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+        address = address_of(1)
+        after = None
+        timings = []
+        for _ in range(args.pages):
+            start = time.perf_counter()
+            page = crud.get_transaction_history_by_address(session=session, address=address, after=after, limit=args.limit)
+            timings.append(time.perf_counter() - start)
+            if len(page) < args.limit:
+                break
+            after = (page[-1].created_at, page[-1].id)
+        print(f"{len(timings)} pages of {args.limit}: first {timings[0] * 1000:.1f}ms, "
+              f"mean {sum(timings) / len(timings) * 1000:.1f}ms, max {max(timings) * 1000:.1f}ms")
+
+        statement = crud.transaction_history_page_statement(address=address, after=None, limit=args.limit)
+        compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+        for (line,) in session.exec(text(f"EXPLAIN ANALYZE {compiled}")):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
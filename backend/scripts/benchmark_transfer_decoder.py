@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of ERC-20 Transfer decoding: web3's ABI-driven
+contract.events.Transfer().process_log against token_transfers.decode_transfers,
+on synthetic receipt logs of a configured token. No node is needed.
+
+    python -m scripts.benchmark_transfer_decoder [--logs N] [--rounds N]
+"""
+import argparse
+import time
+from decimal import Decimal
+
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from app.core.config import settings
+from app.integration import token_transfers
+
+
+def build_logs(token: dict, count: int) -> list[AttributeDict]:
+    sender = HexBytes(b"\x00" * 12 + b"\x11" * 20)
+    return [AttributeDict({
+        "address": token["address"],
+        "topics": [HexBytes(token_transfers.TRANSFER_TOPIC), sender, HexBytes(b"\x00" * 12 + i.to_bytes(20, "big"))],
+        "data": HexBytes((i * 1_000_000).to_bytes(32, "big")),
+        "logIndex": i,
+        "transactionIndex": 0,
+        "transactionHash": HexBytes(b"\xab" * 32),
+        "blockHash": HexBytes(b"\x00" * 32),
+        "blockNumber": 1,
+    }) for i in range(1, count + 1)]
+
+
+def decode_with_process_log(token: dict, logs: list[AttributeDict]) -> list[tuple[str, Decimal]]:
+    event = token["contract"].events.Transfer()
+    decimals = token["decimals"]
+    transfers = []
+    for log in logs:
+        args = event.process_log(log)["args"]
+        transfers.append((args["to"], Decimal(args["value"]) / Decimal(10 ** decimals)))
+    return transfers
+
+
+def timed(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    token = settings.token_by_symbol["USDC"]
+    logs = build_logs(token, args.logs)
+
+    expected = decode_with_process_log(token, logs)
+    decoded = [(t.to_address, t.amount) for t in token_transfers.decode_transfers(logs)]
+    assert decoded == expected, "decoders disagree"
+
+    total = args.logs * args.rounds
+    process_log_elapsed = timed(lambda: decode_with_process_log(token, logs), args.rounds)
+    decoder_elapsed = timed(lambda: token_transfers.decode_transfers(logs), args.rounds)
+
+    print(f"process_log:      {total / process_log_elapsed:,.0f} logs/s")
+    print(f"decode_transfers: {total / decoder_elapsed:,.0f} logs/s ({process_log_elapsed / decoder_elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
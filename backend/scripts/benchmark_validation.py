@@ -0,0 +1,67 @@
+"""
+Load benchmark of transaction validation: the sync service on a thread pool
+(as FastAPI runs sync handlers) against the async service on one event loop.
+Every call counts, whatever its outcome, since the point is the I/O wait;
+with already recorded hashes both paths stop after the chain and DB lookups.
+
+    python -m scripts.benchmark_validation <tx_hash> [<tx_hash> ...] [--requests N] [--threads N]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.db import async_engine, engine
+from app.service import async_transaction_service, transaction_service
+
+
+def validate_sync(transaction_hash: str) -> None:
+    with Session(engine) as session:
+        try:
+            transaction_service.validate_transaction_hash(session=session, transaction_hash=transaction_hash)
+        except Exception:
+            pass
+
+
+async def validate_async(transaction_hash: str) -> None:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        try:
+            await async_transaction_service.validate_transaction_hash(session=session, transaction_hash=transaction_hash)
+        except Exception:
+            pass
+
+
+def run_sync(hashes: list[str], threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(validate_sync, hashes))
+    return time.perf_counter() - start
+
+
+async def run_async(hashes: list[str]) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(validate_async(h) for h in hashes))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("hashes", nargs="+")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=40, help="AnyIO's default thread limit")
+    args = parser.parse_args()
+
+    hashes = [args.hashes[i % len(args.hashes)] for i in range(args.requests)]
+
+    sync_elapsed = run_sync(hashes, args.threads)
+    async_elapsed = asyncio.run(run_async(hashes))
+
+    print(f"sync:  {args.requests / sync_elapsed:,.0f} validations/s ({sync_elapsed:.2f}s, {args.threads} threads)")
+    print(f"async: {args.requests / async_elapsed:,.0f} validations/s ({async_elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Runs the address jobs of the queue with 1, 2, 4... worker processes claiming
+from the same database, and reports the throughput of each run. Also checks
+that every job ran exactly once: all of them COMPLETED, and exactly
+jobs * quantity new addresses. Needs only the database.
+
+    python -m scripts.benchmark_workers [--workers 1 2 4] [--jobs N] [--quantity N]
+"""
+import argparse
+import multiprocessing
+import time
+
+from sqlmodel import Session, func, select
+
+from app.api.models.models import AddressCreationStatus
+from app.core.db import engine
+from app.models import Address, AddressCreationJob
+
+
+def work(start_line) -> None:
+    from app.scheduler import schedulers
+    from app.service import address_index
+    from app.utils import get_eth_addresses_by_indexes
+
+    # process startup and per-process caches stay out of the measurement
+    address_index.warm_up()
+    get_eth_addresses_by_indexes([0])
+    start_line.wait()
+    while schedulers.create_address_job():
+        pass
+
+
+def count_addresses() -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(Address)).one()
+
+
+def run(workers: int, jobs: int, quantity: int) -> float:
+    with Session(engine) as session:
+        queued = [AddressCreationJob(quantity=quantity) for _ in range(jobs)]
+        session.add_all(queued)
+        session.commit()
+        job_ids = [job.id for job in queued]
+    before = count_addresses()
+
+    context = multiprocessing.get_context("spawn")
+    start_line = context.Barrier(workers + 1)
+    processes = [context.Process(target=work, args=(start_line,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    with Session(engine) as session:
+        completed = session.exec(select(func.count()).select_from(AddressCreationJob)
+                                 .where(AddressCreationJob.id.in_(job_ids),
+                                        AddressCreationJob.status == AddressCreationStatus.COMPLETED)).one()
+    created = count_addresses() - before
+    assert completed == jobs, f"{jobs - completed} jobs not completed"
+    assert created == jobs * quantity, f"{created} addresses created, expected {jobs * quantity}"
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--quantity", type=int, default=500)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        elapsed = run(workers, args.jobs, args.quantity)
+        baseline = baseline or elapsed * workers
+        print(f"{workers} workers: {args.jobs / elapsed:.1f} jobs/s, {args.jobs * args.quantity / elapsed:,.0f} addresses/s"
+              f" ({baseline / elapsed / workers:.0%} of linear)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Runs the deposit indexer once, from its checkpoint (or --from-block) up to
+--to-block or the safe head, e.g. against a local dev chain:
+
+    INDEXER_CONFIRMATIONS=0 python -m scripts.index_deposits --from-block 0
+"""
+import argparse
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.service import deposit_indexer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--from-block", type=int, help="rewind the checkpoint to this block")
+    parser.add_argument("--to-block", type=int)
+    args = parser.parse_args()
+
+    if args.from_block is not None:
+        with Session(engine) as session:
+            crud.set_indexer_checkpoint(session=session, name=deposit_indexer.CHECKPOINT, block_number=args.from_block - 1)
+            session.commit()
+
+    print(f"{deposit_indexer.run(to_block=args.to_block)} deposits recorded")
+
+
+if __name__ == "__main__":
+    main()